@@ -0,0 +1,71 @@
+"""
+Checkpoint benchmark: replays one long conversation through the real graph against
+the stub backend, checkpointing after every turn, and reports bytes written per turn
+(deltas versus full snapshots) and the time to resume the conversation.
+
+    python -m benchmarks.checkpoints --turns 200
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+from benchmarks.stub_backend import StubBackend
+
+SCRIPT = ["more", "filter language=english", "hello", "filter pets=yes", "more", "hello"]
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=200)
+    parser.add_argument("--resumes", type=int, default=20, help="resumes timed after the conversation")
+    args = parser.parse_args(argv)
+
+    stub = StubBackend(drivers_per_city=2000, latency_ms=1, jitter_ms=0)
+    os.environ["CABSWALE_BASE_URL"] = stub.start()
+    # Imported here so that config picks up the stub's CABSWALE_BASE_URL
+    from langchain_core.messages import HumanMessage
+    import graph.nodes as nodes
+    from graph.builder import get_app
+    from benchmarks.fake_llm import ScriptedChatModel
+    from schemas.driver_schema import AgentState
+    from services.checkpoints import CheckpointStore, _encode
+
+    nodes.set_chat_model(ScriptedChatModel())
+    app = get_app()
+    path = os.path.join(tempfile.mkdtemp(), "checkpoints.db")
+    store = CheckpointStore(path)
+
+    state = AgentState(session_id="bench")
+    written = []
+    for turn in range(args.turns):
+        state.messages.append(HumanMessage(content=SCRIPT[turn % len(SCRIPT)] if turn else "city Pune"))
+        state = app.invoke({"agent_state": state}, config={"recursion_limit": 50})['agent_state']
+        written.append(store.save(state))
+
+    resume_ms = []
+    for _ in range(args.resumes):
+        store.release("bench")
+        started = time.perf_counter()
+        resumed = store.load("bench")
+        resume_ms.append((time.perf_counter() - started) * 1000)
+    assert resumed.model_dump() == state.model_dump(), "resumed state differs from the live state"
+
+    report = {
+        "turns": args.turns,
+        "messages": len(state.messages),
+        "driver_ids": len(state.driver_ids),
+        "mean_bytes_per_turn": round(sum(written) / len(written), 1),
+        "final_snapshot_bytes": len(_encode(CheckpointStore._snapshot(state))),
+        "store": store.stats(),
+        "resume_ms_p50": round(sorted(resume_ms)[len(resume_ms) // 2], 2),
+        "resume_ms_max": round(max(resume_ms), 2),
+    }
+    print(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
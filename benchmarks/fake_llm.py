@@ -0,0 +1,176 @@
+import json
+import re
+import threading
+import time
+from typing import Any, Iterator, List, Optional
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage, HumanMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+from graph.compaction import estimate_tokens
+from prompts.system_prompt import STATE_HEADER
+
+# Providers only cache prompt prefixes of at least this many tokens (Gemini 2.5 Flash: 1024)
+CACHE_MIN_TOKENS = 1024
+
+
+class ScriptedChatModel(BaseChatModel):
+    """
+    A deterministic chat model for the benchmarks. It reads simple scripted user
+    commands and answers with the tool calls the real prompt asks for:
+
+    - "city <name>"                 -> set_city, then find_drivers after the city is set
+    - "more"                        -> find_drivers
+    - "filter language=X pets=yes"  -> filter_drivers
+    - "book"                        -> get_driver_contact_info for the first driver shown
+    - anything else, or any tool result -> a plain reply of `reply_chars` characters
+
+    It counts calls and estimated prompt tokens, and is safe to share between sessions.
+    Like a provider with implicit prefix caching, it reports as `cache_read` input tokens
+    the longest run of leading messages that an earlier call sent unchanged, and only
+    when that prefix reaches CACHE_MIN_TOKENS. The trailing state message is ignored
+    when choosing a command.
+    Streaming yields the reply a few words at a time, `stream_delay` seconds apart.
+    """
+
+    reply_chars: int = 400
+    stream_delay: float = 0.0
+    calls: int = 0
+    prompt_tokens: int = 0
+    cached_tokens: int = 0
+    _lock: Any = None
+    _seen_prefixes: Any = None
+
+    def model_post_init(self, __context: Any) -> None:
+        self._lock = threading.Lock()
+        self._seen_prefixes = set()
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted-benchmark"
+
+    def bind_tools(self, tools: Any, **kwargs: Any) -> "ScriptedChatModel":
+        return self
+
+    def reset_counters(self) -> None:
+        with self._lock:
+            self.calls = 0
+            self.prompt_tokens = 0
+            self.cached_tokens = 0
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, **kwargs: Any) -> ChatResult:
+        message_tokens = [estimate_tokens(m) for m in messages]
+        input_tokens = sum(message_tokens)
+        prefixes = self._prefix_keys(messages)
+        with self._lock:
+            self.calls += 1
+            self.prompt_tokens += input_tokens
+            call_number = self.calls
+            cached = 0
+            for i, key in enumerate(prefixes):
+                if key not in self._seen_prefixes:
+                    break
+                cached += message_tokens[i]
+            cache_read = cached if cached >= CACHE_MIN_TOKENS else 0
+            self.cached_tokens += cache_read
+            self._seen_prefixes.update(prefixes)
+        message = self._respond(self._conversation(messages), call_number)
+        message.usage_metadata = {
+            "input_tokens": input_tokens,
+            "output_tokens": estimate_tokens(message),
+            "total_tokens": input_tokens + estimate_tokens(message),
+            "input_token_details": {"cache_read": cache_read},
+        }
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager: Any = None,
+                **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        message = self._generate(messages, stop, **kwargs).generations[0].message
+        if message.tool_calls:
+            yield ChatGenerationChunk(message=AIMessageChunk(
+                content="",
+                tool_call_chunks=[
+                    {"name": call["name"], "args": json.dumps(call["args"]), "id": call["id"], "index": i}
+                    for i, call in enumerate(message.tool_calls)
+                ],
+                usage_metadata=message.usage_metadata,
+            ))
+            return
+        # Roughly four words per chunk, like a provider's token stream
+        pieces = re.findall(r"(?:\S+\s*){1,4}", message.content)
+        for i, piece in enumerate(pieces):
+            if self.stream_delay:
+                time.sleep(self.stream_delay)
+            last = i == len(pieces) - 1
+            yield ChatGenerationChunk(message=AIMessageChunk(
+                content=piece, usage_metadata=message.usage_metadata if last else None
+            ))
+
+    @staticmethod
+    def _prefix_keys(messages: List[BaseMessage]) -> List[int]:
+        """Returns one key per leading run of messages; equal keys mean byte-identical prefixes."""
+        keys, key = [], 0
+        for message in messages:
+            key = hash((key, message.type, repr(message.content), repr(getattr(message, "tool_calls", None))))
+            keys.append(key)
+        return keys
+
+    @staticmethod
+    def _conversation(messages: List[BaseMessage]) -> List[BaseMessage]:
+        last = messages[-1] if messages else None
+        if isinstance(last, HumanMessage) and isinstance(last.content, str) and STATE_HEADER in last.content:
+            return messages[:-1]
+        return messages
+
+    def _respond(self, messages: List[BaseMessage], call_number: int) -> AIMessage:
+        last = messages[-1]
+        if isinstance(last, ToolMessage):
+            tool_output = json.loads(last.content)
+            if "city_updated" in tool_output:
+                return self._tool_call("find_drivers", {"city": tool_output["city_updated"]}, call_number)
+            return self._reply()
+
+        if not isinstance(last, HumanMessage):
+            return self._reply()
+        command, _, rest = last.content.strip().partition(" ")
+        if command == "city":
+            return self._tool_call("set_city", {"city": rest}, call_number)
+        if command == "more":
+            return self._tool_call("find_drivers", {"city": ""}, call_number)
+        if command == "filter":
+            args = {}
+            for pair in rest.split():
+                key, _, value = pair.partition("=")
+                if key == "language":
+                    args["language"] = value
+                elif key == "pets":
+                    args["pets_allowed"] = value == "yes"
+                elif key == "vehicle":
+                    args["vehicle_type"] = value
+            return self._tool_call("filter_drivers", args, call_number)
+        if command == "book":
+            driver_id = self._first_presented_driver(messages)
+            if driver_id:
+                return self._tool_call("get_driver_contact_info", {"driver_id": driver_id}, call_number)
+        return self._reply()
+
+    def _tool_call(self, name: str, args: dict, call_number: int) -> AIMessage:
+        return AIMessage(content="", tool_calls=[{"name": name, "args": args, "id": f"call-{call_number}"}])
+
+    def _reply(self) -> AIMessage:
+        sentence = "Aapke liye yeh drivers available hain, bataiye aage kya karna hai. "
+        text = (sentence * (self.reply_chars // len(sentence) + 1))[: self.reply_chars]
+        return AIMessage(content=text)
+
+    @staticmethod
+    def _first_presented_driver(messages: List[BaseMessage]) -> Optional[str]:
+        for message in messages:
+            if isinstance(message, ToolMessage):
+                try:
+                    matched = json.loads(message.content).get("matched_drivers") or []
+                except (TypeError, ValueError, AttributeError):
+                    continue
+                if matched:
+                    return matched[0].get("existingInfo", {}).get("id") or matched[0].get("id")
+        return None
@@ -0,0 +1,54 @@
+"""
+Memory micro-benchmark: bytes held per cached driver when profiles are kept as
+DetailedDriver dicts (the previous cache format) versus compact DriverRecords.
+
+    python -m benchmarks.memory --drivers 20000
+"""
+import argparse
+import gc
+import json
+import sys
+import tracemalloc
+from typing import Any, Callable, Dict, List
+
+from benchmarks.stub_backend import StubBackend
+from schemas.driver_record import DriverRecord
+from services.validation import validate_premium_drivers, validate_detailed_drivers, combine_driver_data
+
+CITIES = ["Pune", "Mumbai", "Delhi", "Bengaluru"]
+
+
+def measure(build: Callable[[], List[Any]]) -> float:
+    """Returns the bytes retained per item by the list that `build` returns."""
+    gc.collect()
+    tracemalloc.start()
+    items = build()
+    retained, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return retained / len(items)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--drivers", type=int, default=20000)
+    args = parser.parse_args(argv)
+
+    stub = StubBackend()
+    drivers_raw = [stub.premium_driver(CITIES[i % len(CITIES)], i) for i in range(args.drivers)]
+    premium = validate_premium_drivers(drivers_raw)
+    models = validate_detailed_drivers([combine_driver_data(p, stub.partner_data(p.id)) for p in premium])
+    # Round-trip through JSON so the dicts do not share strings with the models
+    dumped = json.dumps([driver.model_dump() for driver in models])
+
+    report: Dict[str, Any] = {"drivers": len(models)}
+    report["dict_bytes_per_driver"] = round(measure(lambda: json.loads(dumped)), 1)
+    report["record_bytes_per_driver"] = round(
+        measure(lambda: [DriverRecord.from_dict(profile) for profile in json.loads(dumped)]), 1
+    )
+    report["reduction"] = round(report["dict_bytes_per_driver"] / report["record_bytes_per_driver"], 2)
+    print(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,55 @@
+"""
+Ranking micro-benchmark: time for a ranked filter query over one city's index,
+the work `filter_drivers` does per call, at a given number of cached drivers.
+
+    python -m benchmarks.ranking --drivers 5000 --queries 2000
+"""
+import argparse
+import json
+import sys
+import time
+
+from benchmarks.stub_backend import StubBackend
+from schemas.driver_record import DriverRecord
+from services.driver_index import DriverIndex
+from services.validation import validate_premium_drivers, validate_detailed_drivers, combine_driver_data
+
+QUERIES = [
+    {"languages": "hindi"},
+    {"languages": "english", "vehicleType": "suv"},
+    {"isPetAllowed": True, "tripTypes": "outstation"},
+    {"languages": "marathi"},
+]
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--drivers", type=int, default=5000)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--limit", type=int, default=10, help="matches returned per query")
+    args = parser.parse_args(argv)
+
+    stub = StubBackend()
+    premium = validate_premium_drivers([stub.premium_driver("Pune", i) for i in range(args.drivers)])
+    detailed = validate_detailed_drivers([combine_driver_data(p, stub.partner_data(p.id)) for p in premium])
+    records = [DriverRecord.from_model(driver) for driver in detailed]
+
+    index = DriverIndex()
+    started = time.perf_counter()
+    index.add_many(records)
+    report = {"drivers": len(index), "index_build_ms": round((time.perf_counter() - started) * 1000, 1)}
+
+    session_ids = {record.id for record in records}
+    presented = {record.id for record in records[::3]}
+    for ranked in (False, True):
+        started = time.perf_counter()
+        for i in range(args.queries):
+            index.query(QUERIES[i % len(QUERIES)], within=session_ids, exclude=presented, limit=args.limit, ranked=ranked)
+        elapsed = time.perf_counter() - started
+        report["ranked_us_per_query" if ranked else "unranked_us_per_query"] = round(elapsed / args.queries * 1e6, 1)
+    print(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,166 @@
+"""
+Offline end-to-end benchmark: replays scripted conversations through the real graph
+against a local stub backend and a scripted fake LLM, and reports turn latency,
+backend and LLM calls per turn, prompt tokens and memory per session.
+
+    python -m benchmarks.run --sessions 40 --concurrency 8 --latency-ms 50
+    python -m benchmarks.run --output bench_output.txt --max-p95-ms 500
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+import tracemalloc
+from typing import Dict, Any, List
+
+from benchmarks.stub_backend import StubBackend
+from benchmarks.scenarios import SCENARIOS
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = min(int(round(pct / 100 * (len(ordered) - 1))), len(ordered) - 1)
+    return ordered[rank]
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=20, help="conversations to replay")
+    parser.add_argument("--concurrency", type=int, default=4, help="conversations running at once")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="comma-separated scenario names")
+    parser.add_argument("--latency-ms", type=float, default=50, help="mean stub backend latency")
+    parser.add_argument("--jitter-ms", type=float, default=20, help="uniform jitter around the mean latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of stub requests that fail with 500")
+    parser.add_argument("--slow-rate", type=float, default=0.0, help="fraction of stub requests that stall for --slow-ms")
+    parser.add_argument("--slow-ms", type=float, default=2000, help="stall of a slow stub request")
+    parser.add_argument("--drivers-per-city", type=int, default=60, help="size of each city's driver pool in the stub")
+    parser.add_argument("--pool-limit", type=int, default=None, help="override HTTP_POOL_LIMIT")
+    parser.add_argument("--pool-limit-per-host", type=int, default=None, help="override HTTP_POOL_LIMIT_PER_HOST")
+    parser.add_argument("--reply-chars", type=int, default=400, help="length of the fake LLM's text replies")
+    parser.add_argument("--stream-delay-ms", type=float, default=0, help="delay between the fake LLM's streamed chunks")
+    parser.add_argument("--output", help="write the JSON report to this file")
+    parser.add_argument("--max-p95-ms", type=float, help="exit non-zero if p95 turn latency exceeds this")
+    return parser.parse_args(argv)
+
+
+async def replay(app, scenario: List[str], turn_latencies: List[float], first_token_latencies: List[float]) -> None:
+    from langchain_core.messages import HumanMessage
+    from schemas.driver_schema import AgentState
+    from graph.builder import astream_turn
+
+    state = AgentState()
+    for user_input in scenario:
+        state.messages.append(HumanMessage(content=user_input))
+        started = time.perf_counter()
+        first_token = []
+
+        def on_token(text: str, message_id) -> None:
+            if not first_token:
+                first_token.append((time.perf_counter() - started) * 1000)
+
+        state = await astream_turn(state, on_token, config={"recursion_limit": 50})
+        turn_latencies.append((time.perf_counter() - started) * 1000)
+        first_token_latencies.extend(first_token)
+
+
+async def run_benchmark(args: argparse.Namespace, stub: StubBackend) -> Dict[str, Any]:
+    # Imported here so that config picks up the stub's CABSWALE_BASE_URL
+    import services.api_client as api_client
+    import graph.nodes as nodes
+    from graph.builder import get_app
+    from benchmarks.fake_llm import ScriptedChatModel
+    from services import telemetry
+    from services.profile_cache import profile_cache
+    from services.listing_cache import listing_cache
+    from services.resilience import policy_stats
+
+    if args.pool_limit is not None:
+        api_client.HTTP_POOL_LIMIT = args.pool_limit
+    if args.pool_limit_per_host is not None:
+        api_client.HTTP_POOL_LIMIT_PER_HOST = args.pool_limit_per_host
+    fake_llm = ScriptedChatModel(reply_chars=args.reply_chars, stream_delay=args.stream_delay_ms / 1000)
+    nodes.set_chat_model(fake_llm)
+    app = get_app()
+
+    names = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    turn_latencies: List[float] = []
+    first_token_latencies: List[float] = []
+    slots = asyncio.Semaphore(args.concurrency)
+
+    async def one_session(i: int) -> None:
+        async with slots:
+            await replay(app, SCENARIOS[names[i % len(names)]], turn_latencies, first_token_latencies)
+
+    telemetry.reset()
+    tracemalloc.start()
+    started = time.perf_counter()
+    await asyncio.gather(*(one_session(i) for i in range(args.sessions)))
+    elapsed = time.perf_counter() - started
+    _, peak_bytes = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    turns = len(turn_latencies)
+    return {
+        "sessions": args.sessions,
+        "concurrency": args.concurrency,
+        "turns": turns,
+        "elapsed_s": round(elapsed, 3),
+        "turn_latency_ms": {
+            "p50": round(percentile(turn_latencies, 50), 2),
+            "p95": round(percentile(turn_latencies, 95), 2),
+            "p99": round(percentile(turn_latencies, 99), 2),
+            "max": round(max(turn_latencies, default=0), 2),
+        },
+        "time_to_first_token_ms": {
+            "p50": round(percentile(first_token_latencies, 50), 2),
+            "p95": round(percentile(first_token_latencies, 95), 2),
+        },
+        "backend_calls_per_turn": round(stub.total_calls() / turns, 2) if turns else 0,
+        "backend_calls": dict(stub.calls),
+        "llm_calls_per_turn": round(fake_llm.calls / turns, 2) if turns else 0,
+        "prompt_tokens_per_turn": round(fake_llm.prompt_tokens / turns, 1) if turns else 0,
+        "cached_prompt_tokens_per_turn": round(fake_llm.cached_tokens / turns, 1) if turns else 0,
+        # Sessions overlap, so the peak is shared by up to `concurrency` of them
+        "peak_memory_per_session_kb": round(peak_bytes / min(args.concurrency, args.sessions) / 1024, 1),
+        "coalescing": api_client.coalescing_stats(),
+        "profile_cache_memory": profile_cache.memory_stats(),
+        "listing_cache": listing_cache.stats(),
+        "endpoints": policy_stats(),
+        "spans": {
+            name: summary for name, summary in telemetry.snapshot()["histograms"].items()
+            if name.startswith(("node_ms", "llm_call_ms", "llm_time_to_first_chunk_ms", "llm_cache_read_ratio", "backend_request_ms", "validation_ms"))
+        },
+    }
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    stub = StubBackend(
+        drivers_per_city=args.drivers_per_city,
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate,
+        slow_rate=args.slow_rate,
+        slow_ms=args.slow_ms,
+    )
+    os.environ["CABSWALE_BASE_URL"] = stub.start()
+
+    report = asyncio.run(run_benchmark(args, stub))
+
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    if args.max_p95_ms is not None and report["turn_latency_ms"]["p95"] > args.max_p95_ms:
+        print(f"FAIL: p95 turn latency {report['turn_latency_ms']['p95']}ms exceeds {args.max_p95_ms}ms", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
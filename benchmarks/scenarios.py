@@ -0,0 +1,12 @@
+"""Conversation scripts replayed by the benchmarks, in the commands understood by ScriptedChatModel."""
+
+SCENARIOS = {
+    # Set a city, page through the results and book the first driver shown
+    "browse": ["city Pune", "more", "filter", "book"],
+    # A filter that matches on the first page
+    "filter_hit": ["city Mumbai", "filter language=English", "more", "book"],
+    # A rare filter that needs several extra pages (server-side deepening)
+    "filter_miss": ["city Bengaluru", "filter language=Marathi pets=yes", "book"],
+    # Switching cities mid-conversation resets the session state
+    "city_switch": ["city Delhi", "filter vehicle=suv", "city Chennai", "filter language=Tamil", "book"],
+}
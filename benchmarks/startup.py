@@ -0,0 +1,91 @@
+"""
+Cold-start benchmark: measures, in fresh interpreters, how long importing the graph
+takes and how long the first turn takes with and without the warm-up hook, against
+the stub backend and the scripted fake LLM.
+
+    python -m benchmarks.startup --runs 5 --max-import-ms 1500 --max-first-turn-ms 800
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+
+def _child(mode: str) -> float:
+    """Runs inside the fresh interpreter and returns the measured milliseconds."""
+    started = time.perf_counter()
+    if mode == "import":
+        import graph.builder  # noqa: F401
+        return (time.perf_counter() - started) * 1000
+
+    from benchmarks.stub_backend import StubBackend
+    os.environ["CABSWALE_BASE_URL"] = StubBackend(latency_ms=20, jitter_ms=0).start()
+
+    from langchain_core.messages import HumanMessage
+    import graph.nodes as nodes
+    from graph.builder import get_app, warm_up
+    from schemas.driver_schema import AgentState
+    from benchmarks.fake_llm import ScriptedChatModel
+
+    nodes.set_chat_model(ScriptedChatModel())
+    if mode == "first_turn_warm":
+        warm_up()
+
+    state = AgentState()
+    state.messages.append(HumanMessage(content="city Pune"))
+    started = time.perf_counter()
+    get_app().invoke({"agent_state": state}, config={"recursion_limit": 50})
+    return (time.perf_counter() - started) * 1000
+
+
+def _measure(mode: str, runs: int) -> float:
+    samples = []
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, "-m", "benchmarks.startup", "--child", mode],
+            capture_output=True, text=True, check=True,
+        ).stdout
+        result = next(line for line in output.splitlines() if line.startswith("RESULT "))
+        samples.append(float(result.split()[1]))
+    return round(statistics.median(samples), 2)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3, help="fresh interpreters per measurement (median is reported)")
+    parser.add_argument("--max-import-ms", type=float, help="exit non-zero if importing graph.builder exceeds this")
+    parser.add_argument("--max-first-turn-ms", type=float, help="exit non-zero if the warmed first turn exceeds this")
+    parser.add_argument("--output", help="write the JSON report to this file")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        print(f"RESULT {_child(args.child)}")
+        return 0
+
+    report = {
+        "import_graph_ms": _measure("import", args.runs),
+        "first_turn_cold_ms": _measure("first_turn_cold", args.runs),
+        "first_turn_warm_ms": _measure("first_turn_warm", args.runs),
+    }
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+
+    failed = False
+    if args.max_import_ms is not None and report["import_graph_ms"] > args.max_import_ms:
+        print(f"FAIL: importing the graph took {report['import_graph_ms']}ms, budget {args.max_import_ms}ms", file=sys.stderr)
+        failed = True
+    if args.max_first_turn_ms is not None and report["first_turn_warm_ms"] > args.max_first_turn_ms:
+        print(f"FAIL: first turn took {report['first_turn_warm_ms']}ms, budget {args.max_first_turn_ms}ms", file=sys.stderr)
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,145 @@
+import asyncio
+import random
+import threading
+from typing import Dict, Any, Optional
+
+from aiohttp import web
+
+LANGUAGES = ["Hindi", "English", "Marathi", "Tamil", "Telugu", "Kannada", "Bengali", "Punjabi"]
+VEHICLES = [("Dzire", "sedan"), ("Ertiga", "suv"), ("Innova", "suv"), ("WagonR", "hatchback")]
+TRIP_TYPES = ["local", "outstation", "airport"]
+
+
+class StubBackend:
+    """
+    A local stand-in for the CabSwale cloud functions used by the benchmarks.
+    Serves `typesense-getPartnersByLocation` and `partners-getPartnerData` from a
+    deterministic, generated pool of drivers per city, with configurable latency
+    and error rate. Counts every call it receives.
+    """
+
+    def __init__(
+        self,
+        drivers_per_city: int = 60,
+        latency_ms: float = 50,
+        jitter_ms: float = 20,
+        error_rate: float = 0.0,
+        slow_rate: float = 0.0,
+        slow_ms: float = 2000,
+        seed: int = 7,
+    ):
+        self.drivers_per_city = drivers_per_city
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        # A fraction of requests stalls for slow_ms, to exercise tail-latency handling
+        self.slow_rate = slow_rate
+        self.slow_ms = slow_ms
+        self._random = random.Random(seed)
+        self.calls = {"listing": 0, "details": 0, "errors": 0, "slow": 0}
+        self.base_url: Optional[str] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._runner: Optional[web.AppRunner] = None
+
+    # --- Generated data ---
+    def _driver_id(self, city: str, index: int) -> str:
+        return f"{city.strip().lower()}-{index:05d}"
+
+    def premium_driver(self, city: str, index: int) -> Dict[str, Any]:
+        model, vehicle_type = VEHICLES[index % len(VEHICLES)]
+        return {
+            "id": self._driver_id(city, index),
+            "name": f"Driver {index}",
+            "city": city,
+            "phoneNo": f"+91{9000000000 + index}",
+            "profile_image": "",
+            "userName": f"driver{index}",
+            "verifiedVehicles": [{
+                "reg_no": f"MH12AB{index:04d}",
+                "model": model,
+                "is_commercial": True,
+                # Every seventh vehicle has the malformed cost object the real API sometimes returns
+                "perKmCost": {"min": 10} if index % 7 == 0 else 10 + index % 9,
+                "vehicleType": vehicle_type,
+            }],
+        }
+
+    def partner_data(self, partner_id: str) -> Dict[str, Any]:
+        index = int(partner_id.rsplit("-", 1)[1])
+        # Hindi for everyone, plus one rotating language; Marathi is deliberately rare
+        second = LANGUAGES[1 + index % (len(LANGUAGES) - 1)]
+        languages = ["Hindi"] + ([second] if second != "Marathi" or index % 5 == 0 else [])
+        return {
+            "age": 25 + index % 30,
+            "connections": (index * 37) % 500,
+            "bio": f"Driver {index} has been driving for {index % 20} years and knows the city well.",
+            "experience": index % 20,
+            "isPetAllowed": index % 3 == 0,
+            "languages": languages,
+            "married": index % 2 == 0,
+            "phoneNo": f"+91{9000000000 + index}",
+            "routes": [{"from": "Airport", "to": "Station"}],
+            "tripTypes": [TRIP_TYPES[index % len(TRIP_TYPES)]],
+            "userName": f"driver{index}",
+            "trainingContent": [{"title": "Safety", "status": "done"}, {"title": "Etiquette", "status": "done"}],
+            "vehicleOwnership": [True],
+            "verifiedLanguages": [{"language": lang, "verified": True} for lang in languages],
+            "onboardedAt": "2024-01-01",
+        }
+
+    # --- HTTP handlers ---
+    async def _delay_or_fail(self) -> Optional[web.Response]:
+        delay = max(self.latency_ms + self._random.uniform(-self.jitter_ms, self.jitter_ms), 0) / 1000
+        if self._random.random() < self.slow_rate:
+            self.calls["slow"] += 1
+            delay = self.slow_ms / 1000
+        await asyncio.sleep(delay)
+        if self._random.random() < self.error_rate:
+            self.calls["errors"] += 1
+            return web.json_response({"error": "injected failure"}, status=500)
+        return None
+
+    async def _listing(self, request: web.Request) -> web.Response:
+        self.calls["listing"] += 1
+        payload = await request.json()
+        failure = await self._delay_or_fail()
+        if failure is not None:
+            return failure
+        start = (payload["page"] - 1) * payload["limit"]
+        stop = min(start + payload["limit"], self.drivers_per_city)
+        drivers = [self.premium_driver(payload["city"], i) for i in range(start, stop)]
+        return web.json_response({"data": drivers})
+
+    async def _details(self, request: web.Request) -> web.Response:
+        self.calls["details"] += 1
+        payload = await request.json()
+        failure = await self._delay_or_fail()
+        if failure is not None:
+            return failure
+        return web.json_response({"data": self.partner_data(payload["partnerId"])})
+
+    # --- Lifecycle ---
+    def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        """Starts the stub on a background thread and returns its base URL."""
+        ready = threading.Event()
+
+        def serve():
+            self._loop = asyncio.new_event_loop()
+            app = web.Application()
+            app.router.add_post("/typesense-getPartnersByLocation", self._listing)
+            app.router.add_post("/partners-getPartnerData", self._details)
+            self._runner = web.AppRunner(app, access_log=None)
+            self._loop.run_until_complete(self._runner.setup())
+            site = web.TCPSite(self._runner, host, port)
+            self._loop.run_until_complete(site.start())
+            bound_host, bound_port = self._runner.addresses[0][:2]
+            self.base_url = f"http://{bound_host}:{bound_port}"
+            ready.set()
+            self._loop.run_forever()
+
+        threading.Thread(target=serve, name="stub-backend", daemon=True).start()
+        ready.wait()
+        return self.base_url
+
+    def total_calls(self) -> int:
+        return self.calls["listing"] + self.calls["details"]
@@ -0,0 +1,80 @@
+"""
+Validation micro-benchmark: time to validate one listing page and build its detailed
+profiles, comparing the batched pipeline in services/validation.py with the previous
+record-by-record approach (model -> dict -> model).
+
+    python -m benchmarks.validation --page-size 10 --pages 2000
+"""
+import argparse
+import copy
+import json
+import sys
+import time
+from typing import Any, Dict, List
+
+from benchmarks.stub_backend import StubBackend
+from schemas.driver_schema import PremiumDriver, DetailedDriver
+from services.validation import validate_premium_drivers, validate_detailed_drivers, combine_driver_data
+
+
+def legacy_page(drivers_raw: List[Dict[str, Any]], details: Dict[str, Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """The previous per-record path: mutate raw JSON, dict round trip, nested re-validation."""
+    for driver in drivers_raw:
+        for vehicle in driver.get('verifiedVehicles', []):
+            if isinstance(vehicle.get('perKmCost'), dict):
+                vehicle['perKmCost'] = None
+    premium = [PremiumDriver(**driver).model_dump() for driver in drivers_raw]
+    profiles = []
+    for premium_info in premium:
+        details_from_api = details[premium_info['id']]
+        combined = {
+            "existingInfo": premium_info, "age": details_from_api.get("age"),
+            "connections": details_from_api.get("connections", 0), "bio": details_from_api.get("bio"),
+            "experience": details_from_api.get("experience", 0), "isPetAllowed": details_from_api.get("isPetAllowed"),
+            "languages": details_from_api.get("languages", []), "married": details_from_api.get("married"),
+            "phoneNo": details_from_api.get("phoneNo") or premium_info.get("phoneNo"),
+            "routes": details_from_api.get("routes", []), "tripTypes": details_from_api.get("tripTypes", []),
+            "userName": details_from_api.get("userName") or premium_info.get("userName"),
+            "trainingContent": details_from_api.get("trainingContent", []),
+            "vehicleOwnership": details_from_api.get("vehicleOwnership", []),
+            "verifiedLanguages": details_from_api.get("verifiedLanguages", []),
+            "onboardedAt": details_from_api.get("onboardedAt")
+        }
+        profiles.append(DetailedDriver(**combined).model_dump())
+    return profiles
+
+
+def batched_page(drivers_raw: List[Dict[str, Any]], details: Dict[str, Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """The current path: one compiled pass per page, nested models reused as-is."""
+    premium = validate_premium_drivers(drivers_raw)
+    combined = [combine_driver_data(p, details[p.id]) for p in premium]
+    return [driver.model_dump() for driver in validate_detailed_drivers(combined)]
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--page-size", type=int, default=10)
+    parser.add_argument("--pages", type=int, default=2000, help="pages validated per approach")
+    args = parser.parse_args(argv)
+
+    stub = StubBackend()
+    drivers_raw = [stub.premium_driver("Pune", i) for i in range(args.page_size)]
+    details = {d["id"]: stub.partner_data(d["id"]) for d in drivers_raw}
+    # Each run gets its own copy, since the legacy path mutates the raw JSON
+    pages = [copy.deepcopy(drivers_raw) for _ in range(args.pages)]
+
+    report = {"page_size": args.page_size, "pages": args.pages}
+    for name, validate in (("legacy", legacy_page), ("batched", batched_page)):
+        runs = copy.deepcopy(pages)
+        started = time.perf_counter()
+        for page in runs:
+            validate(page, details)
+        elapsed = time.perf_counter() - started
+        report[f"{name}_us_per_page"] = round(elapsed / args.pages * 1e6, 1)
+    report["speedup"] = round(report["legacy_us_per_page"] / report["batched_us_per_page"], 2)
+    print(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
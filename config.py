@@ -8,8 +8,8 @@ load_dotenv()
 GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
 CABSWALE_API_KEY = os.getenv("CABSWALE_API_KEY")
 
-# API Endpoints
-BASE_URL = "https://us-central1-cabswale-ai.cloudfunctions.net"
+# API Endpoints (CABSWALE_BASE_URL points the app at another backend, e.g. the benchmark stub)
+BASE_URL = os.getenv("CABSWALE_BASE_URL", "https://us-central1-cabswale-ai.cloudfunctions.net")
 GET_DRIVERS_URL = f"{BASE_URL}/typesense-getPartnersByLocation"
 GET_PARTNER_DATA_URL = f"{BASE_URL}/partners-getPartnerData"
 
@@ -17,4 +17,127 @@ GET_PARTNER_DATA_URL = f"{BASE_URL}/partners-getPartnerData"
 # Fetch 10 drivers at a time to build a larger local cache
 DEFAULT_PAGE_LIMIT = 10
 # Set the maximum number of pages to fetch when a filter finds no results
-MAX_FILTER_DEPTH = 5
\ No newline at end of file
+MAX_FILTER_DEPTH = 5
+# Keep fetching pages for a filter while it has fewer matches than this.
+# 1 means "only search further when the filter came up empty".
+FILTER_MIN_MATCHES = 1
+
+# --- DRIVER RANKING ---
+# Weights of the features used to order filter matches, best first.
+# Each feature is scaled to 0..1 across the city's drivers before weighting.
+RANK_WEIGHT_EXPERIENCE = 1.0
+RANK_WEIGHT_CONNECTIONS = 1.0
+# Applied to cheapness: the lowest perKmCost (of the requested vehicle type, if any) scores 1
+RANK_WEIGHT_COST = 1.0
+# Bonus for a verified speaker of the requested language
+RANK_WEIGHT_VERIFIED_LANGUAGE = 1.5
+
+# --- HTTP CLIENT SETTINGS ---
+# Total number of pooled connections shared by all backend calls
+HTTP_POOL_LIMIT = 100
+# Maximum pooled connections to a single host (all endpoints share one host)
+HTTP_POOL_LIMIT_PER_HOST = 30
+# Seconds an idle keep-alive connection is kept open for reuse
+HTTP_KEEPALIVE_TIMEOUT = 60
+# Total timeout in seconds for a single backend request
+HTTP_TIMEOUT = 15
+
+# --- TAIL LATENCY CONTROLS ---
+# Recent request latencies kept per endpoint for the adaptive timeout and hedge delay
+# (a timed-out attempt counts as taking its whole timeout)
+LATENCY_WINDOW = 200
+# Samples needed before the observed percentiles replace HTTP_TIMEOUT
+LATENCY_MIN_SAMPLES = 20
+# Per-attempt timeout is this multiple of the observed p99, within the bounds below
+ADAPTIVE_TIMEOUT_MULTIPLIER = 2.0
+ADAPTIVE_TIMEOUT_MIN = 1.0
+# Each timed-out attempt multiplies the timeout by this factor (up to HTTP_TIMEOUT); each success divides it back
+ADAPTIVE_TIMEOUT_BACKOFF = 2.0
+# Send a second, hedged copy of an idempotent request once the first is slower than the observed p95
+HEDGE_REQUESTS = True
+# Extra attempts for idempotent requests that failed with a network error, timeout or 5xx
+RETRY_ATTEMPTS = 2
+# Retries wait a random time up to min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2**attempt) seconds
+RETRY_BASE_DELAY = 0.1
+RETRY_MAX_DELAY = 1.0
+# Consecutive failed requests (after their retries) that open an endpoint's circuit, and seconds it stays open
+CIRCUIT_FAILURE_THRESHOLD = 5
+CIRCUIT_RESET_TIMEOUT = 10.0
+
+# --- PARTNER PROFILE CACHE ---
+# Seconds a fetched partner profile stays valid before it is fetched again
+PROFILE_CACHE_TTL = 6 * 60 * 60
+# Maximum number of profiles kept in memory (least recently used are evicted)
+PROFILE_CACHE_MAX_SIZE = 50000
+# Optional SQLite file that backs the in-memory cache and survives restarts
+PROFILE_CACHE_PATH = os.getenv("PROFILE_CACHE_PATH")
+
+# --- CITY LISTING CACHE ---
+# Seconds a cached listing page is served as fresh
+LISTING_CACHE_TTL = 5 * 60
+# Seconds past which a stale page is no longer served while it refreshes, and is fetched inline instead
+LISTING_CACHE_MAX_STALE = 60 * 60
+# Maximum number of (city, page, limit) entries kept (least recently used are evicted)
+LISTING_CACHE_MAX_SIZE = 2000
+# Comma-separated cities whose first pages are loaded at startup
+LISTING_WARM_CITIES = [c.strip() for c in os.getenv("LISTING_WARM_CITIES", "Mumbai,Delhi,Bengaluru,Pune,Hyderabad").split(",") if c.strip()]
+# Pages per warm city that are loaded at startup, with their partner profiles
+LISTING_WARM_PAGES = 1
+
+# --- SPECULATIVE PREFETCH ---
+# Load the next page of drivers in the background while the LLM is generating
+PREFETCH_ENABLED = True
+# Seconds a single speculative page load may take before it is abandoned
+PREFETCH_TIMEOUT = 10
+# Maximum number of speculative page loads in flight across all sessions
+PREFETCH_CONCURRENCY = 20
+# Sessions whose prefetchers are kept; the least recently used ones are dropped beyond this
+PREFETCH_MAX_SESSIONS = 10000
+
+# --- CONTEXT COMPACTION ---
+# Approximate token budget for the conversation history sent to the LLM each turn
+CONTEXT_TOKEN_BUDGET = 8000
+# Number of most recent user turns whose tool outputs are sent in full
+CONTEXT_KEEP_FULL_TURNS = 1
+
+# --- SESSION CHECKPOINTS ---
+# Optional SQLite file where conversations are checkpointed after every turn, so they
+# survive restarts and evictions. Their driver profiles are fetched again on resume
+# unless PROFILE_CACHE_PATH keeps them.
+CHECKPOINT_PATH = os.getenv("CHECKPOINT_PATH")
+# Deltas written after a snapshot before the session is compacted into a new snapshot
+CHECKPOINT_COMPACT_EVERY = 20
+# Conversation the command-line client resumes and checkpoints, when CHECKPOINT_PATH is set
+CLI_SESSION_ID = os.getenv("CABSWALE_SESSION_ID", "cli")
+
+# --- SERVING ---
+SERVER_HOST = os.getenv("SERVER_HOST", "127.0.0.1")
+SERVER_PORT = int(os.getenv("SERVER_PORT", "8080"))
+# Maximum number of conversations kept in memory by one worker
+SERVER_MAX_SESSIONS = 10000
+# Seconds of inactivity after which a conversation is evicted
+SESSION_IDLE_TIMEOUT = 30 * 60
+# Turns executed at the same time; each one occupies a worker thread
+SERVER_MAX_ACTIVE_TURNS = 32
+# Turns allowed to wait for a free slot before new ones are rejected
+SERVER_MAX_PENDING_TURNS = 256
+# Concurrent LLM calls across all sessions
+LLM_CONCURRENCY = 16
+# Concurrent backend requests across all sessions
+BACKEND_CONCURRENCY = 64
+
+# --- TELEMETRY ---
+# Fraction of spans written to TELEMETRY_SPAN_FILE (histograms always see every span)
+TELEMETRY_SAMPLE_RATE = float(os.getenv("TELEMETRY_SAMPLE_RATE", "0.1"))
+# Optional JSON-lines file that receives the sampled spans
+TELEMETRY_SPAN_FILE = os.getenv("TELEMETRY_SPAN_FILE")
+# Level of the process log; per-node progress and backend errors are logged at DEBUG
+LOG_LEVEL = os.getenv("LOG_LEVEL", "WARNING").upper()
+# Dump full request payloads and response bodies for every backend call (needs LOG_LEVEL=DEBUG)
+VERBOSE_HTTP_LOGGING = os.getenv("VERBOSE_HTTP_LOGGING", "").lower() in ("1", "true", "yes")
+
+# --- STARTUP ---
+# Compile the graph, build the LLM client and open backend connections before the first turn
+WARM_UP_ON_START = os.getenv("WARM_UP_ON_START", "true").lower() in ("1", "true", "yes")
+# Number of backend connections opened by the warm-up
+WARM_UP_CONNECTIONS = 4
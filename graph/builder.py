@@ -1,7 +1,17 @@
-from langgraph.graph import StateGraph, END
+import inspect
+import threading
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from langgraph.constants import END
 from graph.state import GraphState
-from graph.nodes import agent_node, state_updater_node, tool_node
-from tools.driver_tools import tools
+from graph.nodes import (
+    agent_node,
+    state_updater_node,
+    tool_node,
+    filter_deepening_node,
+    needs_filter_deepening,
+    pending_tool_calls,
+)
 
 def should_continue(state: GraphState) -> str:
     """Conditional edge to decide whether to continue or end the conversation."""
@@ -10,14 +20,30 @@ def should_continue(state: GraphState) -> str:
         return "call_tools"
     return END
 
+def after_state_update(state: GraphState) -> str:
+    """
+    Conditional edge after tool results are applied: run the next stage of tool calls
+    from the same LLM response, keep searching more pages for a filter, or go back to
+    the agent.
+    """
+    current_state = state['agent_state']
+    if pending_tool_calls(current_state):
+        return "call_tools"
+    if needs_filter_deepening(current_state):
+        return "deepen_filter"
+    return "agent"
+
 def create_graph():
     """Builds and compiles the LangGraph agent."""
+    from langgraph.graph import StateGraph
+
     workflow = StateGraph(GraphState)
 
     # Define the nodes
     workflow.add_node("agent", agent_node)
     workflow.add_node("call_tools", tool_node)
     workflow.add_node("update_state", state_updater_node)
+    workflow.add_node("deepen_filter", filter_deepening_node)
 
     # Define the edges
     workflow.set_entry_point("agent")
@@ -30,11 +56,97 @@ def create_graph():
         },
     )
     workflow.add_edge("call_tools", "update_state")
-    workflow.add_edge("update_state", "agent")
+    # Remaining tool-call stages and filter misses are handled here instead of by the LLM
+    for node in ("update_state", "deepen_filter"):
+        workflow.add_conditional_edges(
+            node,
+            after_state_update,
+            {
+                "call_tools": "call_tools",
+                "deepen_filter": "deepen_filter",
+                "agent": "agent",
+            },
+        )
 
     # Compile the graph
     app = workflow.compile()
     return app
 
-# Create a single instance of the app to be imported elsewhere
-app = create_graph()
\ No newline at end of file
+_app = None
+_app_lock = threading.Lock()
+
+def get_app():
+    """Returns the compiled graph shared by the whole process, compiling it on first use."""
+    global _app
+    with _app_lock:
+        if _app is None:
+            _app = create_graph()
+        return _app
+
+def warm_up(open_connections: bool = True, warm_cities: bool = True) -> None:
+    """
+    Moves cold-start work off the first user turn: compiles the graph, constructs the
+    chat model and, optionally, pre-opens pooled connections to the backend and starts
+    loading the first pages of the configured top cities in the background.
+    """
+    from graph.nodes import get_llm_with_tools
+    from services.api_client import warm_up_connections, submit, async_warm_cities
+
+    get_app()
+    get_llm_with_tools()
+    if open_connections:
+        warm_up_connections()
+    if warm_cities:
+        # Not awaited: a slow backend must not hold up startup
+        submit(async_warm_cities())
+
+# Callback for streamed reply text: (text, id of the AI message it belongs to)
+TokenCallback = Callable[[str, Optional[str]], Any]
+
+def message_text(content: Any) -> str:
+    """Returns the text of an AI message or chunk, whose content may be a list of parts."""
+    if isinstance(content, str):
+        return content
+    parts = []
+    for part in content or []:
+        if isinstance(part, str):
+            parts.append(part)
+        elif isinstance(part, dict) and part.get("type") == "text":
+            parts.append(part.get("text", ""))
+    return "".join(parts)
+
+def _reply_token(event: Any) -> Optional[Tuple[str, Optional[str]]]:
+    chunk, metadata = event
+    if metadata.get("langgraph_node") != "agent":
+        return None
+    text = message_text(chunk.content)
+    return (text, chunk.id) if text else None
+
+def stream_turn(agent_state, on_token: TokenCallback, config: Optional[Dict[str, Any]] = None):
+    """
+    Runs one turn through the graph, calling `on_token` with the reply text as the model
+    generates it, and returns the final agent state.
+    """
+    final_state = None
+    for mode, payload in get_app().stream({"agent_state": agent_state}, config=config, stream_mode=["messages", "values"]):
+        if mode == "values":
+            final_state = payload
+        else:
+            token = _reply_token(payload)
+            if token:
+                on_token(*token)
+    return final_state['agent_state']
+
+async def astream_turn(agent_state, on_token: TokenCallback, config: Optional[Dict[str, Any]] = None):
+    """Async version of `stream_turn`; `on_token` may be a coroutine function."""
+    final_state = None
+    async for mode, payload in get_app().astream({"agent_state": agent_state}, config=config, stream_mode=["messages", "values"]):
+        if mode == "values":
+            final_state = payload
+        else:
+            token = _reply_token(payload)
+            if token:
+                result = on_token(*token)
+                if inspect.isawaitable(result):
+                    await result
+    return final_state['agent_state']
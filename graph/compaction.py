@@ -0,0 +1,86 @@
+import json
+from typing import Dict, Any, List, Tuple
+
+from langchain_core.messages import BaseMessage, HumanMessage, ToolMessage
+from config import CONTEXT_TOKEN_BUDGET, CONTEXT_KEEP_FULL_TURNS
+
+# Rough characters-per-token ratio; good enough to keep the history within budget.
+_CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(message: BaseMessage) -> int:
+    """Estimates the prompt tokens a message costs, including any tool calls it carries."""
+    text = message.content if isinstance(message.content, str) else json.dumps(message.content)
+    tool_calls = getattr(message, 'tool_calls', None)
+    if tool_calls:
+        text += json.dumps([{"name": c.get("name"), "args": c.get("args")} for c in tool_calls])
+    return len(text) // _CHARS_PER_TOKEN + 1
+
+
+def summarize_driver(driver: Dict[str, Any]) -> Dict[str, Any]:
+    """Reduces a DetailedDriver dict to the fields the model needs to refer back to it."""
+    info = driver.get('existingInfo', {})
+    vehicles = info.get('verifiedVehicles') or []
+    return {
+        "id": info.get('id'),
+        "name": info.get('name') or driver.get('userName'),
+        "languages": driver.get('languages', []),
+        "vehicle": f"{vehicles[0].get('model')} ({vehicles[0].get('vehicleType')})" if vehicles else None,
+        "experience": driver.get('experience'),
+        "isPetAllowed": driver.get('isPetAllowed'),
+        "married": driver.get('married'),
+    }
+
+
+def _compact_tool_message(message: ToolMessage) -> ToolMessage:
+    """Replaces the full driver profiles in an old tool result with short summaries."""
+    try:
+        tool_output = json.loads(message.content)
+    except (TypeError, ValueError):
+        return message
+    if not isinstance(tool_output, dict) or not tool_output.get("matched_drivers"):
+        return message
+    tool_output["matched_drivers"] = [summarize_driver(d) for d in tool_output["matched_drivers"]]
+    return message.model_copy(update={"content": json.dumps(tool_output)})
+
+
+def _split_turns(messages: List[BaseMessage]) -> List[List[BaseMessage]]:
+    """Groups messages into turns that each start with a user message."""
+    turns: List[List[BaseMessage]] = []
+    for message in messages:
+        if isinstance(message, HumanMessage) or not turns:
+            turns.append([])
+        turns[-1].append(message)
+    return turns
+
+
+def compact_messages(
+    messages: List[BaseMessage],
+    budget: int = CONTEXT_TOKEN_BUDGET,
+    keep_full_turns: int = CONTEXT_KEEP_FULL_TURNS,
+) -> Tuple[List[BaseMessage], int, int]:
+    """
+    Builds the history to send to the LLM within an approximate token budget.
+    Tool outputs older than the last `keep_full_turns` turns are reduced to driver
+    summaries, then the oldest whole turns are dropped until the history fits. Turns
+    are kept or dropped as a unit, so every tool call stays paired with its result.
+    The stored history is not modified.
+    Returns the compacted messages and the estimated tokens before and after.
+    """
+    tokens_before = sum(estimate_tokens(m) for m in messages)
+
+    turns = _split_turns(messages)
+    old_turns = max(len(turns) - keep_full_turns, 0)
+    for i in range(old_turns):
+        turns[i] = [_compact_tool_message(m) if isinstance(m, ToolMessage) else m for m in turns[i]]
+
+    turn_tokens = [sum(estimate_tokens(m) for m in turn) for turn in turns]
+    total = sum(turn_tokens)
+    first = 0
+    # The latest turn is always kept, even if it alone exceeds the budget
+    while total > budget and first < len(turns) - 1:
+        total -= turn_tokens[first]
+        first += 1
+
+    compacted = [m for turn in turns[first:] for m in turn]
+    return compacted, tokens_before, total
@@ -1,163 +1,401 @@
 import json
-from typing import Dict, Any, List
+import logging
+import threading
 from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional, Set
 
-from langchain_core.messages import ToolMessage
-from langchain_google_genai import ChatGoogleGenerativeAI
-from config import GOOGLE_API_KEY, DEFAULT_PAGE_LIMIT, GET_PARTNER_DATA_URL, MAX_FILTER_DEPTH
+import time
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage, ToolMessage, message_chunk_to_message
+from config import GOOGLE_API_KEY, DEFAULT_PAGE_LIMIT, MAX_FILTER_DEPTH, FILTER_MIN_MATCHES, LLM_CONCURRENCY
 from graph.state import GraphState
-from tools.driver_tools import tools
+from tools.driver_tools import tools, filter_drivers
 from schemas.driver_schema import AgentState
-from prompts.system_prompt import get_system_prompt
+from schemas.driver_record import DriverRecord
+from prompts.system_prompt import STATIC_SYSTEM_PROMPT, get_state_prompt
+from graph.compaction import compact_messages
 from services.api_client import (
     fetch_drivers_from_api,
-    make_api_request,
-    construct_detailed_driver,
-    get_timestamp
+    load_driver_profiles,
 )
+from services.profile_cache import profile_cache
+from services.driver_index import get_city_index
+from services.prefetch import get_prefetcher
+from services.telemetry import traced, span, observe, increment, SIZE_BUCKETS, RATIO_BUCKETS
+
+logger = logging.getLogger(__name__)
+
+# The chat model is built on first use: importing the Gemini client is the most
+# expensive part of a cold start, and many processes never need it before the first turn.
+_llm_with_tools = None
+_llm_lock = threading.Lock()
+
+def get_llm_with_tools():
+    """Returns the tool-bound chat model, constructing it on first use."""
+    global _llm_with_tools
+    with _llm_lock:
+        if _llm_with_tools is None:
+            from langchain_google_genai import ChatGoogleGenerativeAI
+            llm = ChatGoogleGenerativeAI(model="gemini-2.5-flash", temperature=0, google_api_key=GOOGLE_API_KEY)
+            _llm_with_tools = llm.bind_tools(tools)
+        return _llm_with_tools
+
+def set_chat_model(llm) -> None:
+    """Replaces the chat model used by `agent_node`, e.g. with a fake one for benchmarks."""
+    global _llm_with_tools
+    with _llm_lock:
+        _llm_with_tools = llm.bind_tools(tools)
+
+# Caps concurrent LLM calls across all sessions served by this process
+_llm_slots = threading.BoundedSemaphore(LLM_CONCURRENCY)
 
-llm = ChatGoogleGenerativeAI(model="gemini-2.5-flash", temperature=0, google_api_key=GOOGLE_API_KEY)
-llm_with_tools = llm.bind_tools(tools)
+# Byte-identical on every turn and in every session, so the provider can serve it
+# (and the unchanged conversation after it) from its prompt cache
+SYSTEM_MESSAGE = SystemMessage(content=STATIC_SYSTEM_PROMPT)
 
+def build_prompt(current_state: AgentState, history: List[BaseMessage]) -> List[BaseMessage]:
+    """
+    Builds the model input: the static system message, the conversation, and the
+    per-turn state block as the last message. Only the last message changes between
+    calls, so everything before it stays a cacheable prefix.
+    """
+    return [SYSTEM_MESSAGE] + history + [HumanMessage(content=get_state_prompt(current_state))]
+
+@traced("node", node="agent")
 def agent_node(state: GraphState) -> Dict[str, Any]:
-    """The primary node that decides the next action."""
-    print("--- NODE: Agent ---")
+    """
+    The primary node that decides the next action.
+    The model is streamed, so graph runs with stream_mode="messages" receive its tokens
+    as they are generated; the chunks are aggregated into one message for the state.
+    """
     current_state: AgentState = state['agent_state']
-    system_prompt = get_system_prompt(current_state)
-    messages = [system_prompt] + current_state.messages
-    response = llm_with_tools.invoke(messages)
+    history, tokens_before, tokens_after = compact_messages(current_state.messages)
+    observe("context_tokens", tokens_before, buckets=SIZE_BUCKETS, stage="before_compaction")
+    observe("context_tokens", tokens_after, buckets=SIZE_BUCKETS, stage="after_compaction")
+    messages = build_prompt(current_state, history)
+    with _llm_slots, span("llm_call") as llm_span:
+        started = time.perf_counter()
+        response = None
+        for chunk in get_llm_with_tools().stream(messages):
+            if response is None:
+                first_chunk_ms = (time.perf_counter() - started) * 1000
+                llm_span.set("time_to_first_chunk_ms", round(first_chunk_ms, 3))
+                observe("llm_time_to_first_chunk_ms", first_chunk_ms)
+                response = chunk
+            else:
+                response = response + chunk
+        response = message_chunk_to_message(response) if response is not None else AIMessage(content="")
+        llm_span.set("context_tokens_before", tokens_before)
+        llm_span.set("context_tokens_after", tokens_after)
+        usage = getattr(response, "usage_metadata", None) or {}
+        if usage:
+            cache_read = (usage.get("input_token_details") or {}).get("cache_read") or 0
+            llm_span.set("input_tokens", usage.get("input_tokens"))
+            llm_span.set("output_tokens", usage.get("output_tokens"))
+            llm_span.set("cache_read_tokens", cache_read)
+            increment("llm_input_tokens_total", usage.get("input_tokens", 0))
+            increment("llm_output_tokens_total", usage.get("output_tokens", 0))
+            increment("llm_cache_read_tokens_total", cache_read)
+            if usage.get("input_tokens"):
+                observe("llm_cache_read_ratio", cache_read / usage["input_tokens"], buckets=RATIO_BUCKETS)
     current_state.messages.append(response)
     return {"agent_state": current_state}
 
-def tool_node(state: GraphState) -> Dict[str, Any]:
-    """This node now handles the complex filtering and contact info logic."""
-    print("--- NODE: Tool Executor ---")
-    current_state: AgentState = state['agent_state']
-    last_message = current_state.messages[-1]
+def _load_session_profiles(current_state: AgentState, driver_ids: List[str]) -> Dict[str, DriverRecord]:
+    """
+    Returns the profiles of session drivers keyed by ID, in the given order. Profiles
+    that expired or were evicted from the shared cache are fetched again.
+    """
+    profiles = profile_cache.get_many(driver_ids)
+    missing = [
+        current_state.driver_listings[driver_id] for driver_id in driver_ids
+        if driver_id not in profiles and driver_id in current_state.driver_listings
+    ]
+    if missing:
+        increment("driver_profiles_refetched_total", len(missing))
+        profiles.update(load_driver_profiles(missing))
+    return {driver_id: profiles[driver_id] for driver_id in driver_ids if driver_id in profiles}
 
-    if not hasattr(last_message, 'tool_calls') or not last_message.tool_calls:
-        return {}
+def _find_unseen_matches(current_state: AgentState, filters: Dict[str, Any], limit: int,
+                         exclude: Optional[Set[str]] = None) -> List[Dict[str, Any]]:
+    """
+    Returns the best session drivers that match `filters` and were not presented yet,
+    best first. Drivers in `exclude` are skipped as well.
+    """
+    if not current_state.city:
+        return []
+    index = get_city_index(current_state.city)
+    # Drivers leave the index with their cached profiles; bring this session's back first
+    unindexed = [driver_id for driver_id in current_state.driver_ids if driver_id not in index]
+    if unindexed:
+        index.add_many(_load_session_profiles(current_state, unindexed).values())
+    matched_ids = index.query(
+        filters,
+        within=set(current_state.driver_ids),
+        exclude=current_state.presented_driver_ids | exclude if exclude else current_state.presented_driver_ids,
+        limit=limit,
+        ranked=True,
+    )
+    # Heavy fields are only decoded here, for the drivers actually shown to the model
+    return [record.to_dict() for record in _load_session_profiles(current_state, matched_ids).values()]
 
-    tool_messages = []
-    for tool_call in last_message.tool_calls:
-        tool_name = tool_call.get("name")
-        tool_args = tool_call.get("args")
-        tool_output = {}
+# Tool calls from one LLM response run in stages: a city change before any fetch,
+# a fetch before any filter. Calls in the same stage are independent of each other.
+TOOL_STAGES = {
+    "set_city": 0,
+    "find_drivers": 1,
+    "filter_drivers": 2,
+    "get_driver_contact_info": 2,
+}
 
+# Long-lived pool for running the independent calls of a stage concurrently
+_tool_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="tools")
+
+def _tool_stage(tool_name: str) -> int:
+    return TOOL_STAGES.get(tool_name, max(TOOL_STAGES.values()))
+
+def _last_ai_message_index(messages: List[Any]) -> int:
+    for i in range(len(messages) - 1, -1, -1):
+        if isinstance(messages[i], AIMessage):
+            return i
+    return -1
+
+def pending_tool_calls(current_state: AgentState) -> List[Dict[str, Any]]:
+    """Returns the tool calls of the latest LLM response that have no result yet, in call order."""
+    messages = current_state.messages
+    index = _last_ai_message_index(messages)
+    if index < 0 or not messages[index].tool_calls:
+        return []
+    answered = {m.tool_call_id for m in messages[index + 1:] if isinstance(m, ToolMessage)}
+    return [call for call in messages[index].tool_calls if call["id"] not in answered]
+
+def _last_stage_results(current_state: AgentState) -> List[ToolMessage]:
+    """Returns the tool results written by the latest `tool_node` run, in call order."""
+    messages = current_state.messages
+    results = []
+    stage = None
+    for message in reversed(messages):
+        if not isinstance(message, ToolMessage):
+            break
+        message_stage = _tool_stage(message.name)
+        if stage is not None and message_stage != stage:
+            break
+        stage = message_stage
+        results.append(message)
+    results.reverse()
+    return results
+
+def _execute_tool_call(current_state: AgentState, tool_call: Dict[str, Any],
+                       matched: Optional[Set[str]] = None) -> ToolMessage:
+    """
+    Runs one tool call against the current state and wraps its output in a ToolMessage.
+    A `filter_drivers` call skips the drivers in `matched` and adds its own matches to it.
+    """
+    tool_name = tool_call.get("name")
+    tool_args = tool_call.get("args")
+    tool_output = {}
+
+    with span("tool_call", tool=tool_name):
         if tool_name == "filter_drivers":
-            print(f"--- ACTION: Filtering drivers with criteria: {tool_args} ---")
-            all_drivers = current_state.driver_profiles.values()
-            
-            # We only consider drivers who haven't been presented yet
-            unseen_drivers = [
-                d for d in all_drivers if d['existingInfo']['id'] not in current_state.presented_driver_ids
-            ]
-            
-            # Apply the filters
-            matched_drivers = []
-            for driver in unseen_drivers:
-                matches = True
-                # Language Filter
-                if 'languages' in tool_args and tool_args['languages']:
-                    if not any(lang.lower() == tool_args['languages'] for lang in driver.get('languages', [])):
-                        matches = False
-                # Pets Filter
-                if 'isPetAllowed' in tool_args and tool_args['isPetAllowed'] is not None:
-                    if driver.get('isPetAllowed') != tool_args['isPetAllowed']:
-                        matches = False
-                # Married Filter
-                if 'married' in tool_args and tool_args['married'] is not None:
-                    if driver.get('married') != tool_args['married']:
-                        matches = False
-                
-                if matches:
-                    matched_drivers.append(driver)
-
-            tool_output = {"matched_drivers": matched_drivers[:DEFAULT_PAGE_LIMIT]} # Return up to 10 matches
+            logger.debug("Filtering drivers with criteria: %s", tool_args)
+            filters = filter_drivers.invoke(tool_args)["filters_to_apply"]
+            matched_drivers = _find_unseen_matches(current_state, filters, DEFAULT_PAGE_LIMIT, exclude=matched)
+            if matched is not None:
+                matched.update(driver['existingInfo']['id'] for driver in matched_drivers)
+            tool_output = {"filters_to_apply": filters, "matched_drivers": matched_drivers} # Return up to 10 matches
 
         elif tool_name == "get_driver_contact_info":
-            driver_id = tool_args.get("driver_id_for_contact")
-            driver_profile = current_state.driver_profiles.get(driver_id)
+            driver_id = tool_args.get("driver_id")
+            driver_profile = _load_session_profiles(current_state, [driver_id]).get(driver_id)
             if driver_profile:
-                tool_output = {"contact_info": driver_profile.get("phoneNo")}
+                tool_output = {"contact_info": driver_profile.phoneNo}
             else:
                 tool_output = {"error": "Driver not found in cache."}
-        
+
         else:
             # Handle simple tools like set_city and find_drivers
             selected_tool = next((t for t in tools if t.name == tool_name), None)
             if not selected_tool: raise ValueError(f"Tool '{tool_name}' not found.")
             tool_output = selected_tool.invoke(tool_args)
 
-        tool_messages.append(ToolMessage(content=json.dumps(tool_output), tool_call_id=tool_call["id"]))
+    return ToolMessage(content=json.dumps(tool_output), tool_call_id=tool_call["id"], name=tool_name)
+
+@traced("node", node="call_tools")
+def tool_node(state: GraphState) -> Dict[str, Any]:
+    """
+    Runs the next stage of the pending tool calls. Calls within a stage run
+    concurrently, except `filter_drivers` calls: they run one after another, each
+    skipping the drivers the earlier ones matched, so no driver is presented twice.
+    `state_updater_node` applies the results before the graph comes back here for the
+    next stage, so every call of the response is handled in one pass.
+    """
+    current_state: AgentState = state['agent_state']
+    pending = pending_tool_calls(current_state)
+    if not pending:
+        return {}
+
+    stage = min(_tool_stage(call.get("name")) for call in pending)
+    stage_calls = [call for call in pending if _tool_stage(call.get("name")) == stage]
+    concurrent = [i for i, call in enumerate(stage_calls) if call.get("name") != "filter_drivers"]
+    futures = {
+        i: _tool_executor.submit(_execute_tool_call, current_state, stage_calls[i]) for i in concurrent
+    } if len(stage_calls) > 1 else {}
+    matched: Set[str] = set()
+    tool_messages = [
+        futures[i].result() if i in futures else _execute_tool_call(current_state, call, matched)
+        for i, call in enumerate(stage_calls)
+    ]
 
     current_state.messages.extend(tool_messages)
     return {"agent_state": current_state}
 
+# Added to a tool result when the driver service could not be reached
+PAGE_FETCH_ERROR = "The driver service is temporarily unavailable, no new drivers were loaded. Please try again shortly."
+
+def _fetch_next_page(current_state: AgentState) -> Optional[int]:
+    """
+    Fetches the next page of drivers into the session and returns how many drivers it
+    added, or None if the backend failed. A failure leaves the page and
+    `no_more_drivers` untouched, so the same page is tried again next time.
+    """
+    prefetcher = get_prefetcher(current_state.session_id)
+    prefetched = prefetcher.take(current_state.city, current_state.page, DEFAULT_PAGE_LIMIT)
+    if prefetched is not None:
+        new_premium_drivers, detailed_drivers = prefetched
+    else:
+        logger.debug("Fetching page %s of premium drivers", current_state.page)
+        new_premium_drivers = fetch_drivers_from_api(current_state.city, current_state.page, DEFAULT_PAGE_LIMIT)
+        detailed_drivers = None
+
+    if new_premium_drivers is None:
+        increment("driver_page_fetch_failures_total", stage="listing")
+        return None
+    if not new_premium_drivers:
+        logger.debug("No more premium drivers found from API")
+        current_state.no_more_drivers = True
+        return 0
+
+    if detailed_drivers is None:
+        # --- BACKGROUND FETCHING LOGIC ---
+        # Profiles come from the shared cache; only the misses are fetched, in one
+        # batched gather over the shared connection pool.
+        detailed_drivers = load_driver_profiles(new_premium_drivers)
+    if not detailed_drivers:
+        # Not one profile of the page could be loaded, so the partner service is failing
+        increment("driver_page_fetch_failures_total", stage="profiles")
+        return None
+    get_city_index(current_state.city).add_many(detailed_drivers.values())
+    added = 0
+    for premium_driver in new_premium_drivers:
+        driver_id = premium_driver.id
+        if driver_id in detailed_drivers and driver_id not in current_state.driver_listings:
+            current_state.driver_ids.append(driver_id)
+            current_state.driver_listings[driver_id] = premium_driver
+            added += 1
+    increment("driver_profiles_loaded_total", len(detailed_drivers), source="prefetch" if prefetched else "fetch")
+
+    current_state.page += 1
+    # Speculatively load the following page while the LLM works on this one
+    prefetcher.start(current_state.city, current_state.page, DEFAULT_PAGE_LIMIT)
+    return added
+
+@traced("node", node="update_state")
 def state_updater_node(state: GraphState) -> Dict[str, Any]:
     """This node now triggers background fetching and manages state updates."""
-    print("--- NODE: State Updater ---")
     current_state: AgentState = state['agent_state']
-    last_message = current_state.messages[-1]
-    
-    if not isinstance(last_message, ToolMessage):
+    tool_messages = _last_stage_results(current_state)
+    if not tool_messages:
         return {}
-    
-    tool_output = json.loads(last_message.content)
-    
-    if "city_updated" in tool_output:
-        current_state.city = tool_output["city_updated"]
-        # Reset everything when the city changes
-        current_state.page = 1
-        current_state.driver_profiles = {}
-        current_state.presented_driver_ids = []
-        current_state.filters = {}
-        current_state.filter_search_depth = 0
-        current_state.no_more_drivers = False
-        print(f"--- STATE: City updated to {current_state.city}. State reset. ---")
-
-    if "city" in tool_output: # This comes from the find_drivers tool
-        print(f"--- ACTION: Fetching page {current_state.page} of premium drivers... ---")
-        new_premium_drivers = fetch_drivers_from_api(current_state.city, current_state.page, DEFAULT_PAGE_LIMIT)
-        
-        if new_premium_drivers:
-            # --- BACKGROUND FETCHING LOGIC ---
-            def fetch_and_construct_details(premium_driver):
-                payload = {"partnerId": premium_driver['id'], "timestamp": get_timestamp()}
-                details_response = make_api_request(GET_PARTNER_DATA_URL, payload)
-                if "data" in details_response and details_response["data"]:
-                    details_from_api = details_response["data"]
-                    # Handle if API returns a list or a dict
-                    if isinstance(details_from_api, list):
-                        details_from_api = details_from_api[0]
-                    
-                    full_details = construct_detailed_driver(premium_driver, details_from_api)
-                    if full_details:
-                        return full_details['existingInfo']['id'], full_details
-                return None, None
-
-            with ThreadPoolExecutor(max_workers=10) as executor:
-                results = executor.map(fetch_and_construct_details, new_premium_drivers)
-                for driver_id, full_details in results:
-                    if driver_id and full_details:
-                        current_state.driver_profiles[driver_id] = full_details
-                        print(f"--- BG FETCH: Successfully fetched details for {driver_id}")
-
-            current_state.page += 1
-        else:
-            print("--- STATE: No more premium drivers found from API. ---")
-            current_state.no_more_drivers = True
 
-    if "filters_to_apply" in tool_output:
-        current_state.filters.update(tool_output["filters_to_apply"])
-        # When filters are applied, reset the search depth counter
-        current_state.filter_search_depth = 0
-        print(f"--- STATE: Filters updated to {current_state.filters}. ---")
+    # Apply every result of the stage, in call order
+    for tool_message in tool_messages:
+        tool_output = json.loads(tool_message.content)
+
+        if "city_updated" in tool_output:
+            current_state.city = tool_output["city_updated"]
+            # Reset everything when the city changes
+            current_state.page = 1
+            current_state.driver_ids = []
+            current_state.driver_listings = {}
+            current_state.presented_driver_ids = set()
+            current_state.filters = {}
+            current_state.filter_search_depth = 0
+            current_state.no_more_drivers = False
+            logger.debug("City updated to %s, state reset", current_state.city)
+            # Drop any page prefetched for the old city and start on the first page of the new one
+            prefetcher = get_prefetcher(current_state.session_id)
+            prefetcher.cancel()
+            prefetcher.start(current_state.city, current_state.page, DEFAULT_PAGE_LIMIT)
+
+        if "city" in tool_output: # This comes from the find_drivers tool
+            if _fetch_next_page(current_state) is None:
+                tool_output["error"] = PAGE_FETCH_ERROR
+                tool_message.content = json.dumps(tool_output)
+
+        if "filters_to_apply" in tool_output:
+            current_state.filters.update(tool_output["filters_to_apply"])
+            # When filters are applied, reset the search depth counter
+            current_state.filter_search_depth = 0
+            logger.debug("Filters updated to %s", current_state.filters)
+
+        if "matched_drivers" in tool_output:
+            matched_drivers = tool_output["matched_drivers"]
+            # Add the newly presented drivers to the presented list
+            for driver in matched_drivers:
+                current_state.presented_driver_ids.add(driver['existingInfo']['id'])
+
+    return {"agent_state": current_state}
+
+def _latest_filter_result(current_state: AgentState) -> Optional[ToolMessage]:
+    """Returns the last `filter_drivers` result of the latest stage, if there is one."""
+    for tool_message in reversed(_last_stage_results(current_state)):
+        if tool_message.name == "filter_drivers":
+            return tool_message
+    return None
+
+def needs_filter_deepening(current_state: AgentState) -> bool:
+    """
+    True when the latest filter result has too few matches and more pages can still
+    be searched within the depth limit.
+    """
+    filter_message = _latest_filter_result(current_state)
+    if filter_message is None or not current_state.city:
+        return False
+    tool_output = json.loads(filter_message.content)
+    return (
+        len(tool_output["matched_drivers"]) < FILTER_MIN_MATCHES
+        and current_state.filter_search_depth < MAX_FILTER_DEPTH
+        and not current_state.no_more_drivers
+        and "error" not in tool_output
+    )
+
+@traced("node", node="deepen_filter")
+def filter_deepening_node(state: GraphState) -> Dict[str, Any]:
+    """
+    Fetches one more page and re-applies the filters of the latest `filter_drivers` call,
+    without going back to the LLM. The graph loops through this node until enough
+    drivers match, the depth limit is hit or the API runs out of drivers. The filter
+    result message is updated in place, so the model only sees the final result.
+    """
+    current_state: AgentState = state['agent_state']
+    filter_message = _latest_filter_result(current_state)
+    tool_output = json.loads(filter_message.content)
 
-    if "matched_drivers" in tool_output:
+    current_state.filter_search_depth += 1
+    logger.debug("Filter search attempt %s/%s", current_state.filter_search_depth, MAX_FILTER_DEPTH)
+    added = _fetch_next_page(current_state)
+    if added is None:
+        tool_output["error"] = PAGE_FETCH_ERROR
+    elif added and len(tool_output["matched_drivers"]) < DEFAULT_PAGE_LIMIT:
         matched_drivers = tool_output["matched_drivers"]
-        # Add the newly presented drivers to the presented list
-        for driver in matched_drivers:
-            current_state.presented_driver_ids.append(driver['existingInfo']['id'])
+        new_matches = _find_unseen_matches(
+            current_state, tool_output.get("filters_to_apply", {}), DEFAULT_PAGE_LIMIT - len(matched_drivers)
+        )
+        for driver in new_matches:
+            current_state.presented_driver_ids.add(driver['existingInfo']['id'])
+        matched_drivers.extend(new_matches)
 
+    tool_output["search_depth"] = current_state.filter_search_depth
+    tool_output["no_more_drivers"] = current_state.no_more_drivers
+    filter_message.content = json.dumps(tool_output)
     return {"agent_state": current_state}
\ No newline at end of file
@@ -1,16 +1,42 @@
-from langchain_core.messages import HumanMessage
-from schemas.driver_schema import AgentState
-from graph.builder import app
+import logging
+import threading
 
+from config import LOG_LEVEL, WARM_UP_ON_START, CHECKPOINT_PATH, CLI_SESSION_ID
+from prompts.system_prompt import GREETING_MESSAGE
+from services.telemetry import span
+
+
+def _warm_up():
+    """Loads LangChain, compiles the graph and opens backend connections in the background."""
+    try:
+        from graph.builder import warm_up
+        with span("warm_up", entrypoint="cli"):
+            warm_up()
+    except Exception as e:
+        print(f"!!! DEBUG: Warm-up failed, the first turn will do it instead: {e!r}")
 
 
 def run_conversation():
     """
     Manages the conversation loop with the LangGraph agent.
     """
+    # Greet the user before anything heavy is imported; warming up overlaps with their typing
+    print(f"CabSwale: {GREETING_MESSAGE}")
+    if WARM_UP_ON_START:
+        threading.Thread(target=_warm_up, name="warm-up", daemon=True).start()
+
+    from langchain_core.messages import HumanMessage
+    from schemas.driver_schema import AgentState
+    from graph.builder import stream_turn
+
     initial_agent_state = AgentState()
-    
-    print("CabSwale: Namaste! Main aapki cab booking me sahayata kar sakta hun. Aapko kis sheher se cab chaiye?")
+    checkpoints = None
+    if CHECKPOINT_PATH:
+        from services.checkpoints import checkpoint_store as checkpoints, resume_state
+        resumed = resume_state(checkpoints, CLI_SESSION_ID)
+        initial_agent_state = resumed or AgentState(session_id=CLI_SESSION_ID)
+        if resumed is not None:
+            print(f"--- STATE: Resumed session {CLI_SESSION_ID} with {len(resumed.messages)} messages. ---")
     
     while True:
         user_input = input("You: ")
@@ -21,14 +47,22 @@ def run_conversation():
         initial_agent_state.messages.append(HumanMessage(content=user_input))
 
         config = {"recursion_limit": 50}
-        final_state = app.invoke({"agent_state": initial_agent_state}, config=config)
-        
-        ai_response = final_state['agent_state'].messages[-1]
-        
-        if ai_response.content:
-            print(f"CabSwale : {ai_response.content}")
-        
-        initial_agent_state = final_state['agent_state']
+        # Print the reply as it is generated; each new AI message starts on its own line
+        printed = {"message_id": None, "any": False}
+        def print_token(text, message_id):
+            if not printed["any"] or message_id != printed["message_id"]:
+                prefix = "\n" if printed["any"] else ""
+                print(f"{prefix}CabSwale : ", end="")
+                printed.update(message_id=message_id, any=True)
+            print(text, end="", flush=True)
+
+        with span("turn", entrypoint="cli"):
+            initial_agent_state = stream_turn(initial_agent_state, print_token, config=config)
+        if printed["any"]:
+            print()
+        if checkpoints is not None:
+            checkpoints.save(initial_agent_state)
 
 if __name__ == "__main__":
-    run_conversation()
\ No newline at end of file
+    logging.basicConfig(level=LOG_LEVEL)
+    run_conversation()
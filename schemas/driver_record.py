@@ -0,0 +1,188 @@
+import json
+import sys
+import zlib
+from typing import Any, Dict, Optional, Tuple
+
+from schemas.driver_schema import DetailedDriver
+
+# (reg_no, model, is_commercial, perKmCost, vehicleType)
+VehicleTuple = Tuple[str, str, Optional[bool], Optional[float], str]
+
+# Fields that are large, rarely read and only needed when a driver is shown in full.
+# They are kept as one zlib-compressed JSON blob and decoded on access.
+HEAVY_FIELDS = ('bio', 'routes', 'trainingContent', 'verifiedLanguages')
+
+
+def _intern(value: Optional[str]) -> Optional[str]:
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+class DriverRecord:
+    """
+    A compact, read-only form of a DetailedDriver for long-lived caches.
+    Uses slots instead of a per-instance dict, tuples instead of lists, interned
+    strings for low-cardinality values (city, languages, vehicle model and type, trip
+    types), and keeps the heavy fields compressed until they are read.
+    """
+
+    __slots__ = (
+        'id', 'name', 'city', 'phoneNo', 'profile_image', 'userName', 'vehicles',
+        'age', 'connections', 'experience', 'isPetAllowed', 'married',
+        'languages', 'tripTypes', 'vehicleOwnership', 'onboardedAt', '_heavy',
+    )
+
+    def __init__(
+        self,
+        id: str,
+        phoneNo: str,
+        name: Optional[str] = None,
+        city: Optional[str] = None,
+        profile_image: Optional[str] = "",
+        userName: Optional[str] = None,
+        vehicles: Tuple[VehicleTuple, ...] = (),
+        age: Optional[int] = None,
+        connections: int = 0,
+        experience: int = 0,
+        isPetAllowed: Optional[bool] = None,
+        married: Optional[bool] = None,
+        languages: Tuple[str, ...] = (),
+        tripTypes: Tuple[str, ...] = (),
+        vehicleOwnership: Tuple[bool, ...] = (),
+        onboardedAt: Optional[str] = None,
+        heavy: Optional[Dict[str, Any]] = None,
+    ):
+        self.id = id
+        self.name = name
+        self.city = _intern(city)
+        self.phoneNo = phoneNo
+        self.profile_image = profile_image or None
+        self.userName = userName
+        self.vehicles = tuple(
+            (reg_no, _intern(model), is_commercial, per_km_cost, _intern(vehicle_type))
+            for reg_no, model, is_commercial, per_km_cost, vehicle_type in vehicles
+        )
+        self.age = age
+        self.connections = connections
+        self.experience = experience
+        self.isPetAllowed = isPetAllowed
+        self.married = married
+        self.languages = tuple(_intern(lang) for lang in languages)
+        self.tripTypes = tuple(_intern(trip) for trip in tripTypes)
+        self.vehicleOwnership = tuple(vehicleOwnership)
+        self.onboardedAt = onboardedAt
+        heavy = {k: v for k, v in (heavy or {}).items() if v}
+        self._heavy = zlib.compress(json.dumps(heavy, separators=(',', ':')).encode()) if heavy else None
+
+    @classmethod
+    def from_model(cls, driver: DetailedDriver) -> "DriverRecord":
+        """Builds a record straight from a validated DetailedDriver, without a dict round trip."""
+        info = driver.existingInfo
+        return cls(
+            id=info.id,
+            name=info.name,
+            city=info.city,
+            phoneNo=driver.phoneNo,
+            profile_image=info.profile_image,
+            userName=driver.userName,
+            vehicles=[(v.reg_no, v.model, v.is_commercial, v.perKmCost, v.vehicleType) for v in info.verifiedVehicles],
+            age=driver.age,
+            connections=driver.connections,
+            experience=driver.experience,
+            isPetAllowed=driver.isPetAllowed,
+            married=driver.married,
+            languages=driver.languages,
+            tripTypes=driver.tripTypes,
+            vehicleOwnership=driver.vehicleOwnership,
+            onboardedAt=driver.onboardedAt,
+            heavy={field: getattr(driver, field) for field in HEAVY_FIELDS},
+        )
+
+    @classmethod
+    def from_dict(cls, profile: Dict[str, Any]) -> "DriverRecord":
+        """Builds a record from a DetailedDriver-shaped dict, e.g. one loaded from disk."""
+        info = profile['existingInfo']
+        return cls(
+            id=info['id'],
+            name=info.get('name'),
+            city=info.get('city'),
+            phoneNo=profile['phoneNo'],
+            profile_image=info.get('profile_image'),
+            userName=profile.get('userName'),
+            vehicles=[
+                (v['reg_no'], v['model'], v.get('is_commercial'), v.get('perKmCost'), v['vehicleType'])
+                for v in info.get('verifiedVehicles', [])
+            ],
+            age=profile.get('age'),
+            connections=profile.get('connections', 0),
+            experience=profile.get('experience', 0),
+            isPetAllowed=profile.get('isPetAllowed'),
+            married=profile.get('married'),
+            languages=profile.get('languages', []),
+            tripTypes=profile.get('tripTypes', []),
+            vehicleOwnership=profile.get('vehicleOwnership', []),
+            onboardedAt=profile.get('onboardedAt'),
+            heavy={field: profile.get(field) for field in HEAVY_FIELDS},
+        )
+
+    def heavy_fields(self) -> Dict[str, Any]:
+        """Decodes the compressed heavy fields. Not cached, so reading them costs no memory."""
+        heavy = json.loads(zlib.decompress(self._heavy)) if self._heavy else {}
+        return {
+            'bio': heavy.get('bio'),
+            'routes': heavy.get('routes', []),
+            'trainingContent': heavy.get('trainingContent', []),
+            'verifiedLanguages': heavy.get('verifiedLanguages', []),
+        }
+
+    @property
+    def vehicle_types(self) -> Tuple[str, ...]:
+        return tuple(v[4] for v in self.vehicles)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Returns the full DetailedDriver-shaped dict, e.g. for a tool result."""
+        return {
+            "existingInfo": {
+                "id": self.id,
+                "name": self.name,
+                "city": self.city,
+                "phoneNo": self.phoneNo,
+                "profile_image": self.profile_image or "",
+                "userName": self.userName,
+                "verifiedVehicles": [
+                    {"reg_no": reg_no, "model": model, "is_commercial": is_commercial,
+                     "perKmCost": per_km_cost, "vehicleType": vehicle_type}
+                    for reg_no, model, is_commercial, per_km_cost, vehicle_type in self.vehicles
+                ],
+            },
+            "age": self.age,
+            "connections": self.connections,
+            "experience": self.experience,
+            "isPetAllowed": self.isPetAllowed,
+            "languages": list(self.languages),
+            "married": self.married,
+            "phoneNo": self.phoneNo,
+            "tripTypes": list(self.tripTypes),
+            "userName": self.userName,
+            "vehicleOwnership": list(self.vehicleOwnership),
+            "onboardedAt": self.onboardedAt,
+            **self.heavy_fields(),
+        }
+
+
+def deep_sizeof(obj: Any, _seen: Optional[set] = None) -> int:
+    """
+    Approximates the bytes held by an object and everything it references.
+    Interned strings shared with other objects are counted once per call.
+    """
+    seen = _seen if _seen is not None else set()
+    if id(obj) in seen or obj is None or isinstance(obj, (bool, type)):
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(deep_sizeof(k, seen) + deep_sizeof(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(deep_sizeof(item, seen) for item in obj)
+    elif hasattr(obj, '__slots__'):
+        size += sum(deep_sizeof(getattr(obj, slot, None), seen) for slot in obj.__slots__)
+    return size
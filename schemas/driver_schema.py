@@ -1,7 +1,7 @@
-from typing import List, Optional, Dict, Any, Union
-from pydantic import BaseModel, Field
+import uuid
+from typing import List, Optional, Dict, Any, Set, Union
+from pydantic import BaseModel, Field, TypeAdapter, field_validator
 
-# --- NO CHANGES TO DRIVER SCHEMAS ---
 class VerifiedVehicle(BaseModel):
     reg_no: str
     model: str
@@ -9,6 +9,12 @@ class VerifiedVehicle(BaseModel):
     perKmCost: Optional[float] = None
     vehicleType: str
 
+    @field_validator('perKmCost', mode='before')
+    @classmethod
+    def _drop_structured_cost(cls, value: Any) -> Any:
+        # The API sometimes sends an object here instead of a number; treat it as unknown
+        return None if isinstance(value, dict) else value
+
 class PremiumDriver(BaseModel):
     id: str
     name: Optional[str] = None
@@ -36,23 +42,35 @@ class DetailedDriver(BaseModel):
     verifiedLanguages: List[Dict[str, Any]] = []
     onboardedAt: Optional[str] = None
 
+# Compiled validators for whole pages, built once at import.
+# A PremiumDriver instance passed as `existingInfo` is not validated again.
+PremiumDriverList = TypeAdapter(List[PremiumDriver])
+DetailedDriverList = TypeAdapter(List[DetailedDriver])
+
 # --- AGENTSTATE IS ENHANCED ---
 class AgentState(BaseModel):
     """
     Represents the state of our cab booking agent.
     """
+    # Identifies the conversation, e.g. for its background prefetcher.
+    session_id: str = Field(default_factory=lambda: uuid.uuid4().hex)
     messages: List[Any] = Field(default_factory=list)
     city: Optional[str] = None
     page: int = 1
     filters: Dict[str, Any] = Field(default_factory=dict)
     
-    # The master cache of all drivers we have fetched, keyed by ID.
-    # This will now store the full DetailedDriver profile.
-    driver_profiles: Dict[str, Dict] = Field(default_factory=dict)
+    # The IDs of all drivers fetched in this session, in fetch order.
+    # The full DetailedDriver profiles live in the shared profile cache.
+    driver_ids: List[str] = Field(default_factory=list)
+
+    # The listing entry of each fetched driver, keyed by ID, so a profile that has
+    # left the shared cache can be fetched again. The entries are shared with the
+    # listing cache rather than copied.
+    driver_listings: Dict[str, PremiumDriver] = Field(default_factory=dict)
     
-    # A list of driver IDs that have already been presented to the user.
+    # The set of driver IDs that have already been presented to the user.
     # This prevents showing the same driver twice.
-    presented_driver_ids: List[str] = Field(default_factory=list)
+    presented_driver_ids: Set[str] = Field(default_factory=set)
     
     # A counter for the recursive filtering process.
     filter_search_depth: int = 0
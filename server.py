@@ -0,0 +1,245 @@
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+from aiohttp import web, WSMsgType
+from langchain_core.messages import HumanMessage
+
+from config import LOG_LEVEL, SERVER_HOST, SERVER_PORT, SERVER_MAX_ACTIVE_TURNS, SERVER_MAX_PENDING_TURNS, WARM_UP_ON_START
+from graph.builder import get_app, warm_up, astream_turn, message_text, TokenCallback
+from prompts.system_prompt import GREETING_MESSAGE
+from schemas.driver_schema import AgentState
+from services.session_store import Session, SessionStore, SessionLimitError
+from services.telemetry import span, render_prometheus
+from services.profile_cache import profile_cache
+from services.listing_cache import listing_cache
+from services.resilience import policy_stats
+
+logger = logging.getLogger(__name__)
+
+
+class ServerBusyError(Exception):
+    """Raised when too many turns are already waiting to run."""
+
+
+class TurnFailedError(Exception):
+    """
+    Raised when the graph, the model or the backend fails during a turn.
+    `unavailable` is set when the failure is an overloaded or unreachable upstream,
+    which the client should retry later, rather than a bad upstream response.
+    """
+
+    def __init__(self, message: str, unavailable: bool = False):
+        super().__init__(message)
+        self.unavailable = unavailable
+
+
+def _is_unavailable(error: Exception) -> bool:
+    status = getattr(error, "status_code", None) or getattr(error, "status", None)
+    return isinstance(error, (asyncio.TimeoutError, ConnectionError)) or status == 429 or status == 503
+
+
+class TurnLimiter:
+    """
+    Bounds how many turns run at once and how many may wait for a slot.
+    Turns beyond both limits are rejected immediately instead of queueing forever.
+    """
+
+    def __init__(self, max_active: int = SERVER_MAX_ACTIVE_TURNS, max_pending: int = SERVER_MAX_PENDING_TURNS):
+        self.max_active = max_active
+        self.max_pending = max_pending
+        self._slots = asyncio.Semaphore(max_active)
+        self._waiting = 0
+
+    async def __aenter__(self):
+        if self._slots.locked() and self._waiting >= self.max_pending:
+            raise ServerBusyError("Too many turns in progress, try again shortly.")
+        self._waiting += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self._waiting -= 1
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self._slots.release()
+
+
+def _copy_state(state: AgentState) -> AgentState:
+    """
+    Copies a session's state so a failed turn can be undone. The containers a turn
+    mutates are copied; messages and driver listings themselves are shared, since
+    turns only append them.
+    """
+    return state.model_copy(update={
+        "messages": list(state.messages),
+        "filters": dict(state.filters),
+        "driver_ids": list(state.driver_ids),
+        "driver_listings": dict(state.driver_listings),
+        "presented_driver_ids": set(state.presented_driver_ids),
+    })
+
+
+async def run_turn(request: web.Request, session: Session, user_input: str,
+                   on_token: Optional[TokenCallback] = None) -> str:
+    """
+    Runs one user turn through the graph and returns the assistant's reply.
+    With `on_token`, the reply is also streamed to it as the model generates it.
+    If the turn fails, the session's state is rolled back to where it was before it,
+    so the client can simply resend the message.
+    """
+    async with session.lock, request.app["turn_limiter"]:
+        before = _copy_state(session.state)
+        session.state.messages.append(HumanMessage(content=user_input))
+        config = {"recursion_limit": 50}
+        try:
+            with span("turn", entrypoint="server"):
+                if on_token is None:
+                    final_state = await get_app().ainvoke({"agent_state": session.state}, config=config)
+                    session.state = final_state['agent_state']
+                else:
+                    session.state = await astream_turn(session.state, on_token, config=config)
+        except Exception as e:
+            session.state = before
+            logger.debug("Turn failed for session %s: %r", session.session_id, e)
+            raise TurnFailedError("The assistant could not answer right now, please try again.",
+                                  unavailable=_is_unavailable(e)) from e
+        # Checkpoint before releasing the session lock, off the event loop
+        await asyncio.get_running_loop().run_in_executor(None, request.app["sessions"].checkpoint, session)
+        session.touch()
+        return message_text(session.state.messages[-1].content)
+
+
+async def create_session(request: web.Request) -> web.Response:
+    try:
+        session = request.app["sessions"].create()
+    except SessionLimitError as e:
+        raise web.HTTPServiceUnavailable(text=str(e), headers={"Retry-After": "30"})
+    return web.json_response({"session_id": session.session_id, "reply": GREETING_MESSAGE})
+
+
+async def post_message(request: web.Request) -> web.Response:
+    session = await request.app["sessions"].get(request.match_info["session_id"])
+    if session is None:
+        raise web.HTTPNotFound(text="Unknown or expired session.")
+    try:
+        body = await request.json()
+    except ValueError:
+        body = None
+    if not isinstance(body, dict):
+        raise web.HTTPBadRequest(text="Body must be a JSON object.")
+    user_input = body.get("message")
+    if not isinstance(user_input, str) or not user_input.strip():
+        raise web.HTTPBadRequest(text="'message' must be a non-empty string.")
+    if session.lock.locked():
+        raise web.HTTPConflict(text="A turn is already running for this session.")
+    try:
+        reply = await run_turn(request, session, user_input)
+    except ServerBusyError as e:
+        raise web.HTTPServiceUnavailable(text=str(e), headers={"Retry-After": "1"})
+    except TurnFailedError as e:
+        if e.unavailable:
+            raise web.HTTPServiceUnavailable(text=str(e), headers={"Retry-After": "5"})
+        raise web.HTTPBadGateway(text=str(e))
+    return web.json_response({"session_id": session.session_id, "reply": reply})
+
+
+async def delete_session(request: web.Request) -> web.Response:
+    if not request.app["sessions"].remove(request.match_info["session_id"], forget=True):
+        raise web.HTTPNotFound(text="Unknown or expired session.")
+    return web.json_response({"deleted": True})
+
+
+async def websocket_session(request: web.Request) -> web.WebSocketResponse:
+    """
+    A conversation over a WebSocket. Each text frame from the client is one user
+    message. The reply is streamed back as `{"type": "token"}` JSON frames while the
+    model generates it, followed by one frame with the complete reply. A turn that
+    fails is answered with an `{"error": ...}` frame and the socket stays open.
+    """
+    try:
+        session = await request.app["sessions"].get_or_create(request.match_info["session_id"])
+    except SessionLimitError as e:
+        raise web.HTTPServiceUnavailable(text=str(e), headers={"Retry-After": "30"})
+
+    ws = web.WebSocketResponse(heartbeat=30)
+    await ws.prepare(request)
+    if not session.state.messages:
+        await ws.send_json({"session_id": session.session_id, "reply": GREETING_MESSAGE})
+
+    async def send_token(text: str, message_id: Optional[str]) -> None:
+        await ws.send_json({"type": "token", "message_id": message_id, "text": text})
+
+    async for msg in ws:
+        if msg.type != WSMsgType.TEXT:
+            continue
+        try:
+            reply = await run_turn(request, session, msg.data, on_token=send_token)
+        except (ServerBusyError, TurnFailedError) as e:
+            # Keep the socket open; the failed message can be sent again
+            await ws.send_json({"error": str(e), "retry": True})
+            continue
+        await ws.send_json({"session_id": session.session_id, "reply": reply})
+    return ws
+
+
+async def health(request: web.Request) -> web.Response:
+    sessions: SessionStore = request.app["sessions"]
+    return web.json_response({"sessions": len(sessions), "evictions": sessions.evictions, "resumed": sessions.resumed})
+
+
+async def metrics(request: web.Request) -> web.Response:
+    """Prometheus-style text endpoint with the telemetry histograms and cache gauges."""
+    cache_stats = {**profile_cache.stats(), **profile_cache.memory_stats()}
+    gauges = [f"profile_cache_{name} {value}" for name, value in cache_stats.items()]
+    gauges += [f"listing_cache_{name} {value}" for name, value in listing_cache.stats().items()]
+    for endpoint, stats in policy_stats().items():
+        gauges.append(f'backend_circuit_open{{endpoint="{endpoint}"}} {int(stats["circuit"] != "closed")}')
+        gauges.append(f'backend_adaptive_timeout_seconds{{endpoint="{endpoint}"}} {stats["timeout_s"]}')
+    gauges.append(f"active_sessions {len(request.app['sessions'])}")
+    return web.Response(text=render_prometheus() + "\n".join(gauges) + "\n", content_type="text/plain")
+
+
+async def invalidate_listings(request: web.Request) -> web.Response:
+    """Drops cached listing pages, for one city (`?city=...`) or for every city."""
+    dropped = listing_cache.invalidate(request.query.get("city"))
+    return web.json_response({"invalidated": dropped})
+
+
+async def _on_startup(app: web.Application) -> None:
+    # Graph nodes are synchronous, so ainvoke runs them in the loop's default
+    # executor. Size it to the number of turns allowed to run at once.
+    loop = asyncio.get_running_loop()
+    loop.set_default_executor(ThreadPoolExecutor(max_workers=SERVER_MAX_ACTIVE_TURNS, thread_name_prefix="graph"))
+    app["turn_limiter"] = TurnLimiter()
+    if WARM_UP_ON_START:
+        # Compile the graph and open backend connections before accepting the first turn
+        with span("warm_up", entrypoint="server"):
+            await loop.run_in_executor(None, warm_up)
+    app["eviction_task"] = asyncio.create_task(app["sessions"].run_eviction())
+
+
+async def _on_cleanup(app: web.Application) -> None:
+    app["eviction_task"].cancel()
+
+
+def create_app() -> web.Application:
+    """Builds the HTTP/WebSocket application serving many conversations per process."""
+    app = web.Application()
+    app["sessions"] = SessionStore()
+    app.router.add_post("/sessions", create_session)
+    app.router.add_post("/sessions/{session_id}/messages", post_message)
+    app.router.add_delete("/sessions/{session_id}", delete_session)
+    app.router.add_get("/ws/{session_id}", websocket_session)
+    app.router.add_get("/health", health)
+    app.router.add_get("/metrics", metrics)
+    app.router.add_delete("/cache/listings", invalidate_listings)
+    app.on_startup.append(_on_startup)
+    app.on_cleanup.append(_on_cleanup)
+    return app
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=LOG_LEVEL)
+    web.run_app(create_app(), host=SERVER_HOST, port=SERVER_PORT)
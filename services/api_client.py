@@ -1,96 +1,405 @@
-import requests
+import asyncio
+import atexit
+import logging
+import random
+import threading
 import time
 import json
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Callable, Coroutine, Tuple, TypeVar
+
+import aiohttp
+
+from config import (
+    BASE_URL,
+    GET_DRIVERS_URL,
+    GET_PARTNER_DATA_URL,
+    HTTP_POOL_LIMIT,
+    HTTP_POOL_LIMIT_PER_HOST,
+    HTTP_KEEPALIVE_TIMEOUT,
+    HTTP_TIMEOUT,
+    BACKEND_CONCURRENCY,
+    VERBOSE_HTTP_LOGGING,
+    WARM_UP_CONNECTIONS,
+    DEFAULT_PAGE_LIMIT,
+    LISTING_WARM_CITIES,
+    LISTING_WARM_PAGES,
+    HEDGE_REQUESTS,
+    RETRY_ATTEMPTS,
+    RETRY_BASE_DELAY,
+    RETRY_MAX_DELAY,
+)
+from schemas.driver_schema import PremiumDriver
+from schemas.driver_record import DriverRecord
+from services.validation import validate_premium_drivers, validate_detailed_drivers, combine_driver_data
+from services.profile_cache import profile_cache
+from services.listing_cache import listing_cache, listing_key
+from services.singleflight import SingleFlight
+from services.resilience import EndpointPolicy, get_policy
+from services.telemetry import span, observe, increment, SIZE_BUCKETS
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# --- SHARED CONNECTION POOL ---
+# All backend traffic goes through one aiohttp session that lives on a dedicated
+# event loop thread. This keeps connections warm across turns and sessions, and
+# lets the synchronous graph nodes use the async client through `run_sync`.
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_loop_lock = threading.Lock()
+_session: Optional[aiohttp.ClientSession] = None
+# Coalesce identical in-flight backend calls across sessions
+_listing_flight = SingleFlight("listing")
+_details_flight = SingleFlight("partner_details")
+# Caps concurrent backend requests across all sessions, independently of the LLM limit
+_backend_slots = asyncio.Semaphore(BACKEND_CONCURRENCY)
+
+
+def _get_loop() -> asyncio.AbstractEventLoop:
+    """Returns the client event loop, starting its thread on first use."""
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            thread = threading.Thread(target=_loop.run_forever, name="cabswale-http", daemon=True)
+            thread.start()
+            atexit.register(_shutdown)
+    return _loop
+
+
+def submit(coro: Coroutine) -> "asyncio.Future":
+    """
+    Schedules a coroutine on the client event loop and returns a concurrent future.
+    Every coroutine that touches the shared session must run on this loop.
+    """
+    return asyncio.run_coroutine_threadsafe(coro, _get_loop())
+
+
+def run_sync(coro: Coroutine) -> Any:
+    """Runs a coroutine on the client event loop and blocks until it finishes."""
+    return submit(coro).result()
+
+
+async def _get_session() -> aiohttp.ClientSession:
+    """Lazily creates the pooled session. Must be called on the client loop."""
+    global _session
+    if _session is None or _session.closed:
+        connector = aiohttp.TCPConnector(
+            limit=HTTP_POOL_LIMIT,
+            limit_per_host=HTTP_POOL_LIMIT_PER_HOST,
+            keepalive_timeout=HTTP_KEEPALIVE_TIMEOUT,
+        )
+        _session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=HTTP_TIMEOUT),
+            headers={"Content-Type": "application/json"},
+        )
+    return _session
+
+
+async def close_session() -> None:
+    """Closes the pooled session and all of its connections."""
+    global _session
+    if _session is not None and not _session.closed:
+        await _session.close()
+    _session = None
+
+
+async def _cancel_and_close() -> None:
+    # Abandon in-flight work such as speculative prefetches before closing the pool
+    tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    await close_session()
+
+
+def _shutdown() -> None:
+    """Cancels in-flight requests and closes pooled connections when the interpreter exits."""
+    if _session is not None:
+        try:
+            submit(_cancel_and_close()).result(timeout=5)
+        except Exception:
+            pass
+
+
+def coalescing_stats() -> Dict[str, Dict[str, Any]]:
+    """Returns how many backend calls were started and how many were deduplicated, per call kind."""
+    return {"listing": _listing_flight.stats(), "partner_details": _details_flight.stats()}
+
+
+async def async_warm_up_connections(count: int = WARM_UP_CONNECTIONS) -> int:
+    """
+    Opens up to `count` pooled connections to the backend host ahead of the first
+    real request, so the first turn does not pay for DNS and TLS handshakes.
+    Returns how many connections were opened.
+    """
+    session = await _get_session()
+
+    async def open_one() -> bool:
+        try:
+            async with session.head(BASE_URL, allow_redirects=False) as response:
+                await response.read()
+            return True
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            return False
+
+    results = await asyncio.gather(*(open_one() for _ in range(count)))
+    return sum(results)
+
+def warm_up_connections(count: int = WARM_UP_CONNECTIONS) -> int:
+    """Synchronous wrapper around `async_warm_up_connections`."""
+    return run_sync(async_warm_up_connections(count))
+
+
+async def async_warm_cities(cities: List[str] = LISTING_WARM_CITIES, pages: int = LISTING_WARM_PAGES) -> int:
+    """
+    Loads the first `pages` listing pages of each city, and their partner profiles,
+    into the shared caches so the first search in a popular city is served locally.
+    Returns how many non-empty pages were loaded.
+    """
+    async def warm_city(city: str) -> int:
+        loaded = 0
+        for page in range(1, pages + 1):
+            drivers = await async_fetch_drivers_from_api(city, page, DEFAULT_PAGE_LIMIT)
+            if not drivers:
+                break
+            await async_load_driver_profiles(drivers)
+            loaded += 1
+        return loaded
+
+    results = await asyncio.gather(*(warm_city(city) for city in cities))
+    return sum(results)
 
-from config import GET_DRIVERS_URL, GET_PARTNER_DATA_URL
-from schemas.driver_schema import PremiumDriver, DetailedDriver
 
 def get_timestamp():
     """Generates a timestamp in milliseconds."""
     return int(time.time() * 1000)
 
-def make_api_request(url: str, payload: dict) -> Dict[str, Any]:
-    """A helper function to make POST requests to the backend with extensive debugging."""
-    headers = {"Content-Type": "application/json"}
-    
-    print("\n" + "="*25 + " API REQUEST SENT " + "="*25)
-    print(f"DEBUG: Target URL: {url}")
-    print(f"DEBUG: Outgoing Payload:\n{json.dumps(payload, indent=2)}")
-    print("="*70)
+# (parsed body or error dict, whether the failure is worth retrying, HTTP status or None)
+Attempt = Tuple[Dict[str, Any], bool, Optional[int]]
 
+async def _send(url: str, payload: dict, endpoint: str, policy: EndpointPolicy) -> Attempt:
+    """
+    Sends one attempt with the endpoint's adaptive timeout. Returns the parsed body (or
+    an error dict), whether a failure is worth retrying and the response status.
+    Feeds the latency tracker; the circuit breaker is fed once per logical request
+    by `async_make_api_request`.
+    """
+    if VERBOSE_HTTP_LOGGING:
+        logger.debug("API request sent to %s with payload:\n%s", url, json.dumps(payload, indent=2))
+
+    response_text = ""
+    status = None
+    timeout = policy.latency.timeout()
     try:
-        response = requests.post(url, json=payload, headers=headers, timeout=15)
-        
-        print("\n" + "="*25 + " API RESPONSE RECEIVED " + "="*22)
-        print(f"DEBUG: Status Code: {response.status_code}")
-        print(f"DEBUG: Raw Response Text:\n{response.text}")
-        print("="*70)
-
-        response.raise_for_status()
-        return response.json()
-    except requests.exceptions.HTTPError as http_err:
-        print(f"!!! DEBUG: HTTP ERROR during API request: {http_err}")
-        return {"error": str(http_err), "raw_response": response.text}
-    except requests.exceptions.RequestException as e:
-        print(f"!!! DEBUG: NETWORK ERROR during API request: {e}")
-        return {"error": str(e)}
+        session = await _get_session()
+        async with _backend_slots:
+            started = time.perf_counter()
+            async with session.post(url, json=payload, timeout=aiohttp.ClientTimeout(total=timeout)) as response:
+                status = response.status
+                response_text = await response.text()
+                observe("backend_response_bytes", len(response_text), buckets=SIZE_BUCKETS, endpoint=endpoint)
+
+                if VERBOSE_HTTP_LOGGING:
+                    logger.debug("API response received with status %s:\n%s", response.status, response_text)
+
+                response.raise_for_status()
+                body = json.loads(response_text)
+            policy.latency.record(time.perf_counter() - started)
+        return body, False, status
+    except aiohttp.ClientResponseError as http_err:
+        increment("backend_request_failures_total", endpoint=endpoint, reason="http")
+        logger.debug("HTTP error during API request: %s", http_err)
+        # Client errors would fail again and say nothing about the endpoint's health
+        retryable = http_err.status >= 500 or http_err.status == 429
+        return {"error": str(http_err), "raw_response": response_text}, retryable, status
+    except asyncio.TimeoutError as e:
+        increment("backend_request_failures_total", endpoint=endpoint, reason="timeout")
+        logger.debug("Timeout during API request after %.2fs: %r", timeout, e)
+        policy.latency.record_timeout(timeout)
+        return {"error": f"Request timed out after {timeout:.2f}s"}, True, status
+    except aiohttp.ClientError as e:
+        increment("backend_request_failures_total", endpoint=endpoint, reason="network")
+        logger.debug("Network error during API request: %r", e)
+        return {"error": str(e) or type(e).__name__}, True, status
     except json.JSONDecodeError as json_err:
-        print(f"!!! DEBUG: JSON DECODE ERROR - API did not return valid JSON: {json_err}")
-        return {"error": "Invalid JSON response from server", "raw_response": response.text}
+        increment("backend_request_failures_total", endpoint=endpoint, reason="json")
+        logger.debug("API did not return valid JSON: %s", json_err)
+        return {"error": "Invalid JSON response from server", "raw_response": response_text}, False, status
+
+async def _send_hedged(url: str, payload: dict, endpoint: str, policy: EndpointPolicy) -> Attempt:
+    """
+    Sends one attempt and, if it is still running after the endpoint's observed p95,
+    a second copy. The first successful response wins and the other copy is cancelled.
+    """
+    delay = policy.latency.hedge_delay() if HEDGE_REQUESTS else None
+    tasks = [asyncio.ensure_future(_send(url, payload, endpoint, policy))]
+    try:
+        if delay is None:
+            return await tasks[0]
+        done, _ = await asyncio.wait(tasks, timeout=delay)
+        if done:
+            return tasks[0].result()
 
+        increment("backend_hedged_requests_total", endpoint=endpoint)
+        tasks.append(asyncio.ensure_future(_send(url, payload, endpoint, policy)))
+        pending = set(tasks)
+        result = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                result = task.result()
+                if "error" not in result[0]:
+                    if task is tasks[1]:
+                        increment("backend_hedge_wins_total", endpoint=endpoint)
+                    return result
+        return result
+    finally:
+        for task in tasks:
+            task.cancel()
 
-# The rest of the file remains the same, but will now use the highly verbose make_api_request function.
+async def async_make_api_request(url: str, payload: dict, idempotent: bool = False) -> Dict[str, Any]:
+    """
+    Makes a POST request to the backend over the shared pool.
+    Per-attempt timeouts follow the endpoint's observed p99. Idempotent requests are
+    also hedged after the observed p95 and retried with jittered backoff on network
+    errors, timeouts and 5xx responses. The circuit breaker counts one failure per
+    request, however many copies and retries it took. While an endpoint's circuit is
+    open, requests fail immediately with an error dict, so callers degrade instead of
+    waiting; the single probe let through while it is half-open is neither hedged nor
+    retried.
+    Each request is recorded as a `backend_request` span with its outcome, the HTTP
+    status of the last attempt, attempts and latency; full payload and body dumps are only logged when VERBOSE_HTTP_LOGGING is on.
+    """
+    endpoint = url.rsplit("/", 1)[-1]
+    policy = get_policy(endpoint)
+    breaker = policy.breaker
+    with span("backend_request", endpoint=endpoint) as request_span:
+        if not breaker.allow():
+            request_span.set("status", "circuit_open")
+            return {"error": f"Circuit open for {endpoint}, failing fast."}
+        probing = breaker.state == breaker.HALF_OPEN
+        attempts = 1 + (RETRY_ATTEMPTS if idempotent and not probing else 0)
+        sent = 0
+        for attempt in range(attempts):
+            if attempt:
+                # Other requests may have opened the circuit meanwhile
+                if breaker.state != breaker.CLOSED:
+                    break
+                increment("backend_retries_total", endpoint=endpoint)
+                await asyncio.sleep(random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** attempt)))
+            if idempotent and not probing:
+                result, retryable, status = await _send_hedged(url, payload, endpoint, policy)
+            else:
+                result, retryable, status = await _send(url, payload, endpoint, policy)
+            sent += 1
+            if not retryable:
+                break
+        # An answer that would fail again anyway (4xx, malformed body) still shows the
+        # endpoint is up; counting it as a success also ends a half-open probe
+        if "error" not in result or not retryable:
+            breaker.record_success()
+        else:
+            breaker.record_failure()
+        request_span.set("attempts", sent)
+        request_span.set("http_status", status)
+        request_span.set("status", "error" if "error" in result else "ok")
+        return result
 
-def fetch_drivers_from_api(city: str, page: int, limit: int) -> List[Dict[str, Any]]:
-    """Fetches a paginated list of drivers for a given city from the API."""
+async def async_fetch_drivers_from_api(city: str, page: int, limit: int) -> Optional[List[PremiumDriver]]:
+    """
+    Fetches a paginated list of drivers for a given city from the API, or returns None
+    if the backend call failed, so callers can tell a failure from the end of the list.
+    Pages are served from the shared listing cache, keyed by normalized city, so every
+    spelling of a city shares one entry. The backend still gets the city as the user
+    spelled it. Concurrent misses for the same key share one backend call.
+    """
+    key = listing_key(city, page, limit)
+    drivers = await listing_cache.get(
+        key, lambda: _listing_flight.do(key, lambda: _fetch_drivers_page(city, page, limit))
+    )
+    return drivers
+
+async def _fetch_drivers_page(city: str, page: int, limit: int) -> Optional[List[PremiumDriver]]:
+    """Returns the validated page, or None if the backend call failed (so it is not cached)."""
     payload = {"city": city, "limit": limit, "page": page, "timestamp": get_timestamp()}
-    response_data = make_api_request(GET_DRIVERS_URL, payload)
-    
+    # Listing and partner lookups are reads, so they are safe to hedge and retry
+    response_data = await async_make_api_request(GET_DRIVERS_URL, payload, idempotent=True)
+    if "error" in response_data:
+        return None
+
     drivers_raw = response_data.get("data", [])
     
     if not isinstance(drivers_raw, list):
-        return []
+        return None
 
-    for driver in drivers_raw:
-        if 'verifiedVehicles' in driver and isinstance(driver['verifiedVehicles'], list):
-            for vehicle in driver['verifiedVehicles']:
-                if isinstance(vehicle.get('perKmCost'), dict):
-                    vehicle['perKmCost'] = None
-    try:
-        validated_drivers = [PremiumDriver(**driver).dict() for driver in drivers_raw]
-        return validated_drivers
-    except Exception as e:
-        print(f"!!! DEBUG: Pydantic validation failed for PremiumDriver list: {e}")
-        return []
+    return validate_premium_drivers(drivers_raw)
+
+def fetch_drivers_from_api(city: str, page: int, limit: int) -> Optional[List[PremiumDriver]]:
+    """Synchronous wrapper around `async_fetch_drivers_from_api`."""
+    return run_sync(async_fetch_drivers_from_api(city, page, limit))
 
-def construct_detailed_driver(
-    premium_info: Dict[str, Any], 
-    details_from_api: Dict[str, Any]
-) -> Optional[Dict[str, Any]]:
+
+async def async_fetch_partner_data(partner_id: str) -> Optional[Dict[str, Any]]:
     """
-    Manually constructs the final DetailedDriver object.
+    Fetches the raw partner data for one driver, or None if the backend has none.
+    Concurrent lookups of the same partnerId, from any session, share one backend call.
     """
-    if not details_from_api:
-        return None
+    return await _details_flight.do(partner_id, lambda: _fetch_partner_data(partner_id))
 
-    combined_data = {
-        "existingInfo": premium_info, "age": details_from_api.get("age"),
-        "connections": details_from_api.get("connections", 0), "bio": details_from_api.get("bio"),
-        "experience": details_from_api.get("experience", 0), "isPetAllowed": details_from_api.get("isPetAllowed"),
-        "languages": details_from_api.get("languages", []), "married": details_from_api.get("married"),
-        "phoneNo": details_from_api.get("phoneNo") or premium_info.get("phoneNo"),
-        "routes": details_from_api.get("routes", []), "tripTypes": details_from_api.get("tripTypes", []),
-        "userName": details_from_api.get("userName") or premium_info.get("userName"),
-        "trainingContent": details_from_api.get("trainingContent", []),
-        "vehicleOwnership": details_from_api.get("vehicleOwnership", []),
-        "verifiedLanguages": details_from_api.get("verifiedLanguages", []),
-        "onboardedAt": details_from_api.get("onboardedAt")
-    }
-    
-    try:
-        validated_driver = DetailedDriver(**combined_data).dict()
-        return validated_driver
-    except Exception as e:
-        print(f"!!! DEBUG: Pydantic validation failed for constructed DetailedDriver: {e}")
-        return None
\ No newline at end of file
+async def _fetch_partner_data(partner_id: str) -> Optional[Dict[str, Any]]:
+    payload = {"partnerId": partner_id, "timestamp": get_timestamp()}
+    details_response = await async_make_api_request(GET_PARTNER_DATA_URL, payload, idempotent=True)
+    details_from_api = details_response.get("data")
+    # Handle if API returns a list or a dict
+    if isinstance(details_from_api, list):
+        details_from_api = details_from_api[0] if details_from_api else None
+    return details_from_api or None
+
+async def async_fetch_driver_details_batch(premium_drivers: List[PremiumDriver]) -> Dict[str, DriverRecord]:
+    """
+    Fetches details for a whole page of drivers in one gather over the shared pool and
+    validates the page in a single pass. Returns compact driver records keyed by driver
+    ID, in page order.
+    """
+    details = await asyncio.gather(*(async_fetch_partner_data(d.id) for d in premium_drivers))
+    combined = [
+        combine_driver_data(premium_driver, details_from_api)
+        for premium_driver, details_from_api in zip(premium_drivers, details)
+        if details_from_api
+    ]
+    if not combined:
+        return {}
+    return {driver.existingInfo.id: DriverRecord.from_model(driver) for driver in validate_detailed_drivers(combined)}
+
+async def _in_profile_cache(func: Callable[..., T], *args: Any) -> T:
+    """Runs a profile cache call, in the default executor when it does disk I/O, so it never stalls the client loop."""
+    if profile_cache.blocking_io:
+        return await asyncio.get_running_loop().run_in_executor(None, func, *args)
+    return func(*args)
+
+async def async_load_driver_profiles(premium_drivers: List[PremiumDriver]) -> Dict[str, DriverRecord]:
+    """
+    Returns driver records for a page of drivers keyed by driver ID, in page order.
+    Profiles already in the shared profile cache are reused; only the misses are
+    fetched from the backend, and the fetched profiles are added to the cache.
+    """
+    cached = await _in_profile_cache(profile_cache.get_many, [d.id for d in premium_drivers])
+    missing = [premium_driver for premium_driver in premium_drivers if premium_driver.id not in cached]
+
+    fetched = await async_fetch_driver_details_batch(missing) if missing else {}
+    if fetched:
+        await _in_profile_cache(profile_cache.put_many, fetched)
+
+    profiles = {}
+    for premium_driver in premium_drivers:
+        driver_id = premium_driver.id
+        profile = cached.get(driver_id) or fetched.get(driver_id)
+        if profile is not None:
+            profiles[driver_id] = profile
+    return profiles
+
+def load_driver_profiles(premium_drivers: List[PremiumDriver]) -> Dict[str, DriverRecord]:
+    """Synchronous wrapper around `async_load_driver_profiles`."""
+    return run_sync(async_load_driver_profiles(premium_drivers))
@@ -0,0 +1,247 @@
+import json
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Dict, Any, List, Optional
+
+from langchain_core.messages import (
+    AIMessage,
+    BaseMessage,
+    HumanMessage,
+    ToolMessage,
+    messages_from_dict,
+    messages_to_dict,
+)
+
+from config import CHECKPOINT_PATH, CHECKPOINT_COMPACT_EVERY
+from schemas.driver_schema import AgentState, PremiumDriver, PremiumDriverList
+from services.api_client import submit, async_load_driver_profiles
+
+SNAPSHOT, DELTA = 0, 1
+
+# AgentState fields that are small and replaced wholesale rather than appended to
+SCALAR_FIELDS = ('city', 'page', 'filters', 'filter_search_depth', 'no_more_drivers')
+
+
+# Message types written by this graph, rebuilt without re-validation on resume
+_MESSAGE_TYPES = {"human": HumanMessage, "ai": AIMessage, "tool": ToolMessage}
+
+
+def _messages_from_records(records: List[Dict[str, Any]]) -> List[BaseMessage]:
+    """
+    Rebuilds messages written by `messages_to_dict`. The records were produced from
+    validated messages, so the common types skip validation, which is most of the cost
+    of resuming a long conversation. Other types go through LangChain's loader.
+    """
+    messages = []
+    for record in records:
+        message_type = _MESSAGE_TYPES.get(record["type"])
+        if message_type is None:
+            messages.extend(messages_from_dict([record]))
+        else:
+            messages.append(message_type.model_construct(**record["data"]))
+    return messages
+
+
+def _listings_to_records(state: AgentState, driver_ids: List[str]) -> List[Dict[str, Any]]:
+    return [state.driver_listings[driver_id].model_dump() for driver_id in driver_ids if driver_id in state.driver_listings]
+
+
+def _listings_from_records(records: List[Dict[str, Any]]) -> Dict[str, PremiumDriver]:
+    return {listing.id: listing for listing in PremiumDriverList.validate_python(records)}
+
+
+def _encode(record: Dict[str, Any]) -> bytes:
+    return zlib.compress(json.dumps(record, separators=(',', ':')).encode())
+
+
+def _decode(payload: bytes) -> Dict[str, Any]:
+    return json.loads(zlib.decompress(payload))
+
+
+class _Saved:
+    """What was last written for a session, to work out the next delta."""
+
+    __slots__ = ('seq', 'deltas', 'message_count', 'last_message', 'driver_count', 'last_driver_id',
+                 'presented', 'scalars')
+
+    def __init__(self, state: AgentState, seq: int, deltas: int):
+        self.seq = seq
+        self.deltas = deltas
+        self.message_count = len(state.messages)
+        self.last_message = state.messages[-1] if state.messages else None
+        self.driver_count = len(state.driver_ids)
+        self.last_driver_id = state.driver_ids[-1] if state.driver_ids else None
+        self.presented = set(state.presented_driver_ids)
+        self.scalars = {field: getattr(state, field) for field in SCALAR_FIELDS}
+        self.scalars['filters'] = dict(state.filters)
+
+
+class CheckpointStore:
+    """
+    Persists conversations in a SQLite file as a snapshot followed by per-turn deltas.
+    A delta holds only what the turn changed: appended messages, added drivers with
+    their listing entries, newly presented drivers and changed scalar fields. Records
+    are zlib-compressed JSON. When a change cannot be expressed as a delta (e.g. a city
+    change resets the drivers), or after `compact_every` deltas, a new snapshot
+    replaces the session's older records. Thread-safe.
+    """
+
+    def __init__(self, path: str, compact_every: int = CHECKPOINT_COMPACT_EVERY):
+        self.path = path
+        self.compact_every = compact_every
+        self._saved: Dict[str, _Saved] = {}
+        self._lock = threading.Lock()
+        self.snapshots = 0
+        self.deltas = 0
+        self.bytes_written = 0
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS checkpoints ("
+            "session_id TEXT NOT NULL, seq INTEGER NOT NULL, kind INTEGER NOT NULL, "
+            "payload BLOB NOT NULL, created_at REAL NOT NULL, PRIMARY KEY (session_id, seq))"
+        )
+        self._conn.commit()
+
+    def save(self, state: AgentState) -> int:
+        """Checkpoints the state after a turn and returns the number of bytes written."""
+        with self._lock:
+            saved = self._saved.get(state.session_id)
+            delta = self._delta(state, saved) if saved is not None else None
+            if delta is not None and saved.deltas < self.compact_every:
+                seq, kind, payload, deltas = saved.seq + 1, DELTA, _encode(delta), saved.deltas + 1
+            else:
+                seq, kind, payload, deltas = self._next_seq(state.session_id, saved), SNAPSHOT, _encode(self._snapshot(state)), 0
+
+            self._conn.execute(
+                "INSERT INTO checkpoints (session_id, seq, kind, payload, created_at) VALUES (?, ?, ?, ?, ?)",
+                (state.session_id, seq, kind, payload, time.time()),
+            )
+            if kind == SNAPSHOT:
+                # Compaction: the snapshot makes every older record of the session redundant
+                self._conn.execute("DELETE FROM checkpoints WHERE session_id = ? AND seq < ?", (state.session_id, seq))
+                self.snapshots += 1
+            else:
+                self.deltas += 1
+            self._conn.commit()
+            self._saved[state.session_id] = _Saved(state, seq, deltas)
+            self.bytes_written += len(payload)
+            return len(payload)
+
+    def load(self, session_id: str) -> Optional[AgentState]:
+        """Rebuilds the latest checkpointed state of a session, or returns None if it has none."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT seq, kind, payload FROM checkpoints WHERE session_id = ? AND seq >= "
+                "(SELECT MAX(seq) FROM checkpoints WHERE session_id = ? AND kind = ?) ORDER BY seq",
+                (session_id, session_id, SNAPSHOT),
+            ).fetchall()
+            if not rows:
+                return None
+            state = AgentState(session_id=session_id, **self._restore(_decode(rows[0][2])))
+            for _, _, payload in rows[1:]:
+                self._apply(state, _decode(payload))
+            self._saved[session_id] = _Saved(state, rows[-1][0], len(rows) - 1)
+            return state
+
+    def delete(self, session_id: str) -> None:
+        """Forgets a session entirely."""
+        with self._lock:
+            self._conn.execute("DELETE FROM checkpoints WHERE session_id = ?", (session_id,))
+            self._conn.commit()
+            self._saved.pop(session_id, None)
+
+    def release(self, session_id: str) -> None:
+        """Drops the in-memory bookkeeping of a session that left memory; its checkpoints stay."""
+        with self._lock:
+            self._saved.pop(session_id, None)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "tracked_sessions": len(self._saved),
+                "snapshots": self.snapshots,
+                "deltas": self.deltas,
+                "bytes_written": self.bytes_written,
+            }
+
+    def _next_seq(self, session_id: str, saved: Optional[_Saved]) -> int:
+        if saved is not None:
+            return saved.seq + 1
+        row = self._conn.execute("SELECT MAX(seq) FROM checkpoints WHERE session_id = ?", (session_id,)).fetchone()
+        return (row[0] or 0) + 1
+
+    @staticmethod
+    def _snapshot(state: AgentState) -> Dict[str, Any]:
+        record = {field: getattr(state, field) for field in SCALAR_FIELDS}
+        record['messages'] = messages_to_dict(state.messages)
+        record['driver_ids'] = state.driver_ids
+        record['driver_listings'] = _listings_to_records(state, state.driver_ids)
+        record['presented_driver_ids'] = sorted(state.presented_driver_ids)
+        return record
+
+    @staticmethod
+    def _restore(record: Dict[str, Any]) -> Dict[str, Any]:
+        record['messages'] = _messages_from_records(record['messages'])
+        record['driver_listings'] = _listings_from_records(record.get('driver_listings', []))
+        record['presented_driver_ids'] = set(record['presented_driver_ids'])
+        return record
+
+    @staticmethod
+    def _delta(state: AgentState, saved: _Saved) -> Optional[Dict[str, Any]]:
+        """Returns what changed since the last checkpoint, or None if only a snapshot can express it."""
+        messages, driver_ids = state.messages, state.driver_ids
+        if len(messages) < saved.message_count or (
+                saved.message_count and messages[saved.message_count - 1] != saved.last_message):
+            return None
+        if len(driver_ids) < saved.driver_count or (
+                saved.driver_count and driver_ids[saved.driver_count - 1] != saved.last_driver_id):
+            return None
+        if not saved.presented <= state.presented_driver_ids:
+            return None
+
+        delta: Dict[str, Any] = {}
+        if len(messages) > saved.message_count:
+            delta['messages'] = messages_to_dict(messages[saved.message_count:])
+        if len(driver_ids) > saved.driver_count:
+            delta['driver_ids'] = driver_ids[saved.driver_count:]
+            delta['driver_listings'] = _listings_to_records(state, delta['driver_ids'])
+        presented = state.presented_driver_ids - saved.presented
+        if presented:
+            delta['presented_driver_ids'] = sorted(presented)
+        scalars = {field: getattr(state, field) for field in SCALAR_FIELDS if getattr(state, field) != saved.scalars[field]}
+        if scalars:
+            delta['scalars'] = scalars
+        return delta
+
+    @staticmethod
+    def _apply(state: AgentState, delta: Dict[str, Any]) -> None:
+        state.messages.extend(_messages_from_records(delta.get('messages', [])))
+        state.driver_ids.extend(delta.get('driver_ids', []))
+        state.driver_listings.update(_listings_from_records(delta.get('driver_listings', [])))
+        state.presented_driver_ids.update(delta.get('presented_driver_ids', []))
+        for field, value in delta.get('scalars', {}).items():
+            setattr(state, field, value)
+
+
+def resume_state(store: CheckpointStore, session_id: str) -> Optional[AgentState]:
+    """
+    Loads a session's latest state and starts loading its drivers' profiles into the
+    shared cache in the background, fetching the ones it does not hold (e.g. after a
+    restart without PROFILE_CACHE_PATH). Filters re-index the drivers on first use.
+    """
+    state = store.load(session_id)
+    if state is not None and state.driver_listings:
+        submit(async_load_driver_profiles(list(state.driver_listings.values())))
+    return state
+
+
+def _build_checkpoint_store() -> Optional[CheckpointStore]:
+    return CheckpointStore(CHECKPOINT_PATH) if CHECKPOINT_PATH else None
+
+
+# The checkpoint store shared by this process, or None when checkpointing is off.
+checkpoint_store = _build_checkpoint_store()
@@ -0,0 +1,41 @@
+from typing import Dict
+
+# Alternative spellings and former names, mapped to one canonical name per city
+CITY_ALIASES: Dict[str, str] = {
+    "bangalore": "Bengaluru",
+    "bengaluru": "Bengaluru",
+    "bombay": "Mumbai",
+    "mumbai": "Mumbai",
+    "calcutta": "Kolkata",
+    "kolkata": "Kolkata",
+    "madras": "Chennai",
+    "chennai": "Chennai",
+    "gurgaon": "Gurugram",
+    "gurugram": "Gurugram",
+    "poona": "Pune",
+    "pune": "Pune",
+    "new delhi": "Delhi",
+    "delhi": "Delhi",
+    "mysore": "Mysuru",
+    "mysuru": "Mysuru",
+    "baroda": "Vadodara",
+    "vadodara": "Vadodara",
+    "trivandrum": "Thiruvananthapuram",
+    "thiruvananthapuram": "Thiruvananthapuram",
+    "cochin": "Kochi",
+    "kochi": "Kochi",
+    "benaras": "Varanasi",
+    "banaras": "Varanasi",
+    "varanasi": "Varanasi",
+}
+
+
+def canonical_city(city: str) -> str:
+    """Returns the canonical name of a city, e.g. "bangalore " -> "Bengaluru"."""
+    cleaned = " ".join(city.split())
+    return CITY_ALIASES.get(cleaned.lower(), cleaned)
+
+
+def normalize_city(city: str) -> str:
+    """Returns the key that every spelling of a city shares in caches and indexes."""
+    return canonical_city(city).lower()
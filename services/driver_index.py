@@ -0,0 +1,162 @@
+import heapq
+import threading
+from collections import defaultdict
+from typing import Dict, Any, Iterable, List, Optional, Set
+
+from schemas.driver_record import DriverRecord
+from services.cities import normalize_city
+from services.ranking import DriverRanker
+from services.profile_cache import profile_cache
+from services.telemetry import increment
+
+
+def _bool_key(value: Any) -> Optional[bool]:
+    return value if isinstance(value, bool) else None
+
+
+def _index_keys(profile: DriverRecord) -> Dict[str, Set[Any]]:
+    """Extracts the normalized filterable values of a driver record."""
+    return {
+        'languages': {lang.lower() for lang in profile.languages if isinstance(lang, str)},
+        'isPetAllowed': {_bool_key(profile.isPetAllowed)},
+        'married': {_bool_key(profile.married)},
+        'vehicleType': {vehicle_type.lower() for vehicle_type in profile.vehicle_types if vehicle_type},
+        'tripTypes': {t.lower() for t in profile.tripTypes if isinstance(t, str)},
+    }
+
+
+def _normalize_filter_value(value: Any) -> Any:
+    return value.lower() if isinstance(value, str) else value
+
+
+class DriverIndex:
+    """
+    An inverted index over the driver profiles of one city.
+    Each filterable attribute maps a normalized value to the set of driver IDs that
+    have it, so a filter query is a set intersection instead of a scan of every profile.
+    Drivers keep the order in which they were first indexed, unless a query asks for
+    them ranked best first. Drivers whose profiles leave the shared profile cache are
+    removed again, so an index never outgrows the cache.
+    """
+
+    ATTRIBUTES = ('languages', 'isPetAllowed', 'married', 'vehicleType', 'tripTypes')
+
+    def __init__(self):
+        self._postings: Dict[str, Dict[Any, Set[str]]] = {attr: defaultdict(set) for attr in self.ATTRIBUTES}
+        self._keys: Dict[str, Dict[str, Set[Any]]] = {}
+        self._order: Dict[str, int] = {}
+        self._next_order = 0
+        self._ranker = DriverRanker()
+        self._lock = threading.Lock()
+
+    def add(self, profile: DriverRecord) -> None:
+        """Indexes (or re-indexes) one driver record."""
+        driver_id = profile.id
+        keys = _index_keys(profile)
+        with self._lock:
+            self._remove_locked(driver_id)
+            if driver_id not in self._order:
+                self._order[driver_id] = self._next_order
+                self._next_order += 1
+            self._keys[driver_id] = keys
+            self._ranker.add(profile)
+            for attr, values in keys.items():
+                for value in values:
+                    self._postings[attr][value].add(driver_id)
+
+    def add_many(self, profiles: Iterable[DriverRecord]) -> None:
+        for profile in profiles:
+            self.add(profile)
+
+    def remove(self, driver_ids: Iterable[str]) -> int:
+        """Removes drivers from the index and its ranker. Returns how many were indexed."""
+        removed = 0
+        with self._lock:
+            for driver_id in driver_ids:
+                if self._order.pop(driver_id, None) is None:
+                    continue
+                self._remove_locked(driver_id)
+                self._ranker.remove(driver_id)
+                removed += 1
+        return removed
+
+    def query(
+        self,
+        filters: Dict[str, Any],
+        within: Optional[Set[str]] = None,
+        exclude: Optional[Set[str]] = None,
+        limit: Optional[int] = None,
+        ranked: bool = False,
+    ) -> List[str]:
+        """
+        Returns the IDs of drivers matching every filter, in indexing order, or best
+        first when `ranked` is set.
+        `within` restricts the result to a candidate set (e.g. a session's drivers),
+        `exclude` removes IDs (e.g. drivers already presented) and `limit` keeps the top N.
+        Filters with a None value, or on attributes the index does not know, are ignored.
+        """
+        with self._lock:
+            candidates = []
+            for attr, value in filters.items():
+                if value is None or attr not in self._postings:
+                    continue
+                candidates.append(self._postings[attr].get(_normalize_filter_value(value), set()))
+            if within is not None:
+                candidates.append(within)
+
+            if candidates:
+                candidates.sort(key=len)
+                matched = candidates[0].intersection(*candidates[1:])
+            else:
+                matched = set(self._order)
+            if exclude:
+                matched = matched - exclude
+
+            if ranked:
+                return self._ranker.top_k(matched, filters, limit)
+            matched = [driver_id for driver_id in matched if driver_id in self._order]
+            if limit is not None and limit < len(matched):
+                return heapq.nsmallest(limit, matched, key=self._order.__getitem__)
+            return sorted(matched, key=self._order.__getitem__)
+
+    def __contains__(self, driver_id: str) -> bool:
+        return driver_id in self._order
+
+    def __len__(self) -> int:
+        return len(self._order)
+
+    def _remove_locked(self, driver_id: str) -> None:
+        for attr, values in self._keys.pop(driver_id, {}).items():
+            postings = self._postings[attr]
+            for value in values:
+                posting = postings.get(value)
+                if posting is not None:
+                    posting.discard(driver_id)
+                    if not posting:
+                        del postings[value]
+
+
+_city_indexes: Dict[str, DriverIndex] = {}
+_city_indexes_lock = threading.Lock()
+
+
+def get_city_index(city: str) -> DriverIndex:
+    """Returns the process-wide index for a city, creating it on first use. Spellings of a city share one index."""
+    key = normalize_city(city)
+    with _city_indexes_lock:
+        index = _city_indexes.get(key)
+        if index is None:
+            index = _city_indexes[key] = DriverIndex()
+        return index
+
+
+def remove_drivers(driver_ids: List[str]) -> None:
+    """Removes drivers from every city index, e.g. because their profiles left the profile cache."""
+    with _city_indexes_lock:
+        indexes = list(_city_indexes.values())
+    removed = sum(index.remove(driver_ids) for index in indexes)
+    if removed:
+        increment("driver_index_evictions_total", removed)
+
+
+profile_cache.add_eviction_listener(remove_drivers)
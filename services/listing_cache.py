@@ -0,0 +1,146 @@
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from config import LISTING_CACHE_TTL, LISTING_CACHE_MAX_STALE, LISTING_CACHE_MAX_SIZE
+from schemas.driver_schema import PremiumDriver
+from services.cities import normalize_city
+from services.telemetry import increment, observe, AGE_BUCKETS_S
+
+# (normalized city, page, limit)
+ListingKey = Tuple[str, int, int]
+PageFetcher = Callable[[], Awaitable[Optional[List[PremiumDriver]]]]
+
+
+def listing_key(city: str, page: int, limit: int) -> ListingKey:
+    return normalize_city(city), page, limit
+
+
+class ListingCache:
+    """
+    A process-wide cache of listing pages keyed by normalized city, page and limit.
+    Pages younger than `ttl` are served as they are. Older pages, up to `max_stale`,
+    are still served immediately while one background fetch refreshes them
+    (stale-while-revalidate). Anything older is fetched inline.
+    Lookups run on the client event loop; `invalidate` may be called from any thread.
+    """
+
+    def __init__(self, ttl: float = LISTING_CACHE_TTL, max_stale: float = LISTING_CACHE_MAX_STALE,
+                 max_size: int = LISTING_CACHE_MAX_SIZE):
+        self.ttl = ttl
+        self.max_stale = max_stale
+        self.max_size = max_size
+        self._entries: "OrderedDict[ListingKey, Tuple[float, List[PremiumDriver]]]" = OrderedDict()
+        self._refreshing: Dict[ListingKey, "asyncio.Task"] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.refresh_failures = 0
+        self.invalidations = 0
+
+    async def get(self, key: ListingKey, fetch: PageFetcher) -> Optional[List[PremiumDriver]]:
+        """
+        Returns the page for `key`, calling `fetch` on a miss or to refresh a stale page.
+        `fetch` returns None when the backend call failed; failures are never cached.
+        Neither are empty pages: the key is shared by every spelling of a city, and a
+        spelling the backend does not know must not hide the city's drivers from the others.
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                age = now - entry[0]
+                if age <= self.max_stale:
+                    self._entries.move_to_end(key)
+                else:
+                    del self._entries[key]
+                    entry = None
+
+        if entry is None:
+            self.misses += 1
+            increment("listing_cache_lookups_total", result="miss")
+            drivers = await fetch()
+            if drivers:
+                self._store(key, drivers)
+            return drivers
+
+        fetched_at, drivers = entry
+        observe("listing_cache_age_seconds", age, buckets=AGE_BUCKETS_S)
+        if age <= self.ttl:
+            self.hits += 1
+            increment("listing_cache_lookups_total", result="fresh")
+        else:
+            self.stale_hits += 1
+            increment("listing_cache_lookups_total", result="stale")
+            self._start_refresh(key, fetch)
+        return list(drivers)
+
+    def invalidate(self, city: Optional[str] = None) -> int:
+        """Drops every cached page of `city`, or of all cities, and returns how many were dropped."""
+        with self._lock:
+            if city is None:
+                keys = list(self._entries)
+            else:
+                normalized = normalize_city(city)
+                keys = [key for key in self._entries if key[0] == normalized]
+            for key in keys:
+                del self._entries[key]
+            self.invalidations += len(keys)
+        increment("listing_cache_invalidations_total", len(keys))
+        return len(keys)
+
+    def stats(self) -> Dict[str, Any]:
+        """Returns the lookup counters, the current size and the age of the oldest page."""
+        now = time.monotonic()
+        with self._lock:
+            lookups = self.hits + self.stale_hits + self.misses
+            oldest = max((now - fetched_at for fetched_at, _ in self._entries.values()), default=0.0)
+            return {
+                "size": len(self._entries),
+                "hits": self.hits,
+                "stale_hits": self.stale_hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits + self.stale_hits) / lookups if lookups else 0.0,
+                "refreshes": self.refreshes,
+                "refresh_failures": self.refresh_failures,
+                "invalidations": self.invalidations,
+                "oldest_entry_age_s": round(oldest, 1),
+            }
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _store(self, key: ListingKey, drivers: List[PremiumDriver]) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic(), list(drivers))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def _start_refresh(self, key: ListingKey, fetch: PageFetcher) -> None:
+        if key in self._refreshing:
+            return
+
+        async def refresh() -> None:
+            try:
+                drivers = await fetch()
+            finally:
+                self._refreshing.pop(key, None)
+            if not drivers:
+                # Keep serving the stale page; the next stale hit tries again
+                self.refresh_failures += 1
+                increment("listing_cache_refreshes_total", result="failed")
+                return
+            self._store(key, drivers)
+            self.refreshes += 1
+            increment("listing_cache_refreshes_total", result="ok")
+
+        self._refreshing[key] = asyncio.ensure_future(refresh())
+
+
+# The single listing cache shared by every session in this process.
+listing_cache = ListingCache()
@@ -0,0 +1,133 @@
+import asyncio
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from config import PREFETCH_ENABLED, PREFETCH_TIMEOUT, PREFETCH_CONCURRENCY, PREFETCH_MAX_SESSIONS
+from schemas.driver_schema import PremiumDriver
+from schemas.driver_record import DriverRecord
+from services.api_client import submit, async_fetch_drivers_from_api, async_load_driver_profiles
+from services.telemetry import increment
+
+logger = logging.getLogger(__name__)
+
+PrefetchedPage = Tuple[List[PremiumDriver], Dict[str, DriverRecord]]
+
+# Bounds speculative traffic so it cannot crowd out requests a user is waiting on.
+# Only touched on the client event loop.
+_in_flight = 0
+
+
+async def _load_page(city: str, page: int, limit: int) -> Optional[PrefetchedPage]:
+    """Loads one listing page and its partner profiles, within the prefetch budget."""
+    global _in_flight
+    if _in_flight >= PREFETCH_CONCURRENCY:
+        return None
+    _in_flight += 1
+    try:
+        async def load() -> Optional[PrefetchedPage]:
+            premium_drivers = await async_fetch_drivers_from_api(city, page, limit)
+            if premium_drivers is None:
+                # A failed fetch is not an empty page; leave it to the inline fetch
+                return None
+            profiles = await async_load_driver_profiles(premium_drivers) if premium_drivers else {}
+            return premium_drivers, profiles
+        return await asyncio.wait_for(load(), timeout=PREFETCH_TIMEOUT)
+    except asyncio.TimeoutError:
+        increment("prefetch_pages_total", result="timeout")
+        logger.debug("Prefetch of page %s for %s exceeded the %ss budget", page, city, PREFETCH_TIMEOUT)
+        return None
+    finally:
+        _in_flight -= 1
+
+
+class PagePrefetcher:
+    """
+    Speculatively loads the next page of drivers for one session.
+    The loaded page (and its profiles, which also land in the shared profile cache)
+    is only handed to the session when `take` is called for the same city and page.
+    """
+
+    def __init__(self):
+        self._key: Optional[Tuple[str, int, int]] = None
+        self._future = None
+        self._lock = threading.Lock()
+
+    def start(self, city: str, page: int, limit: int) -> None:
+        """Starts loading `page` unless that page is already being prefetched."""
+        if not PREFETCH_ENABLED or not city:
+            return
+        key = (city, page, limit)
+        with self._lock:
+            if self._key == key:
+                return
+            self._cancel_locked()
+            self._key = key
+            self._future = submit(_load_page(city, page, limit))
+        increment("prefetch_pages_total", result="started")
+
+    def take(self, city: str, page: int, limit: int) -> Optional[PrefetchedPage]:
+        """
+        Returns the prefetched page if it matches the request, waiting for it if it is
+        still in flight. Returns None if nothing usable was prefetched.
+        """
+        with self._lock:
+            if self._key != (city, page, limit):
+                return None
+            future = self._future
+            self._key = None
+            self._future = None
+        try:
+            result = future.result()
+        except Exception as e:
+            increment("prefetch_pages_total", result="failed")
+            logger.debug("Prefetch of page %s for %s failed: %r", page, city, e)
+            return None
+        if result is not None:
+            increment("prefetch_pages_total", result="used")
+        return result
+
+    def cancel(self) -> None:
+        """Drops any speculative load, e.g. because the city changed."""
+        with self._lock:
+            self._cancel_locked()
+
+    def _cancel_locked(self) -> None:
+        if self._future is not None:
+            self._future.cancel()
+        self._key = None
+        self._future = None
+
+
+# Least recently used first. The server discards a session's prefetcher when the session
+# ends; the bound covers callers that never do, such as the CLI and library use.
+_prefetchers: "OrderedDict[str, PagePrefetcher]" = OrderedDict()
+_prefetchers_lock = threading.Lock()
+
+
+def get_prefetcher(session_id: str) -> PagePrefetcher:
+    """
+    Returns the prefetcher of a session, creating it on first use. Beyond
+    PREFETCH_MAX_SESSIONS, the least recently used prefetcher is cancelled and dropped.
+    """
+    evicted = []
+    with _prefetchers_lock:
+        prefetcher = _prefetchers.get(session_id)
+        if prefetcher is None:
+            prefetcher = _prefetchers[session_id] = PagePrefetcher()
+            while len(_prefetchers) > PREFETCH_MAX_SESSIONS:
+                evicted.append(_prefetchers.popitem(last=False)[1])
+        else:
+            _prefetchers.move_to_end(session_id)
+    for stale in evicted:
+        stale.cancel()
+    return prefetcher
+
+
+def discard_prefetcher(session_id: str) -> None:
+    """Cancels and forgets the prefetcher of a session that has ended."""
+    with _prefetchers_lock:
+        prefetcher = _prefetchers.pop(session_id, None)
+    if prefetcher is not None:
+        prefetcher.cancel()
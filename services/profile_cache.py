@@ -0,0 +1,236 @@
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Callable, Iterable, List, Optional, Tuple
+
+from config import PROFILE_CACHE_TTL, PROFILE_CACHE_MAX_SIZE, PROFILE_CACHE_PATH
+from schemas.driver_record import DriverRecord, deep_sizeof
+
+
+class ProfileCache:
+    """
+    A process-wide, thread-safe cache of detailed driver profiles keyed by partnerId.
+    Profiles are held as compact `DriverRecord`s. Entries expire after `ttl` seconds
+    and the least recently used entries are evicted once `max_size` is reached.
+    Listeners added with `add_eviction_listener` hear about every evicted or expired
+    ID, so structures built from the cached profiles can shrink with the cache.
+    """
+
+    # Whether lookups and stores may block on disk, so async callers should run them in an executor
+    blocking_io = False
+
+    def __init__(self, ttl: float = PROFILE_CACHE_TTL, max_size: int = PROFILE_CACHE_MAX_SIZE):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries: "OrderedDict[str, Tuple[float, DriverRecord]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self._listeners: List[Callable[[List[str]], None]] = []
+        # IDs dropped under the lock, reported to the listeners once it is released
+        self._dropped: List[str] = []
+
+    def get(self, driver_id: str) -> Optional[DriverRecord]:
+        """Returns the cached profile for `driver_id`, or None if it is missing or stale."""
+        return self.get_many([driver_id]).get(driver_id)
+
+    def get_many(self, driver_ids: Iterable[str]) -> Dict[str, DriverRecord]:
+        """
+        Returns the cached profiles for `driver_ids`, in the given order, skipping misses.
+        Profiles missing from memory are looked up in the backing store in one batch.
+        """
+        driver_ids = list(driver_ids)
+        now = time.time()
+        with self._lock:
+            found = {}
+            for driver_id in driver_ids:
+                profile = self._get_locked(driver_id, now)
+                if profile is not None:
+                    found[driver_id] = profile
+            missing = [driver_id for driver_id in driver_ids if driver_id not in found]
+            self.hits += len(found)
+        if missing:
+            # The backing store is read without the lock, so other lookups keep being served from memory
+            loaded = self._load_many(missing)
+            with self._lock:
+                for driver_id, (fetched_at, profile) in loaded.items():
+                    # A profile stored while the backing store was read is at least as fresh
+                    current = self._get_locked(driver_id, now)
+                    if current is None:
+                        self._store_locked(driver_id, profile, fetched_at)
+                        current = profile
+                    found[driver_id] = current
+                self.hits += len(loaded)
+                self.misses += len(missing) - len(loaded)
+        self._notify_dropped()
+        return {driver_id: found[driver_id] for driver_id in driver_ids if driver_id in found}
+
+    def put(self, driver_id: str, profile: DriverRecord) -> None:
+        """Stores a freshly fetched profile."""
+        self.put_many({driver_id: profile})
+
+    def put_many(self, profiles: Dict[str, DriverRecord]) -> None:
+        """Stores a batch of freshly fetched profiles, with a single write to the backing store."""
+        now = time.time()
+        with self._lock:
+            for driver_id, profile in profiles.items():
+                self._store_locked(driver_id, profile, now)
+        self._save_many(profiles, now)
+        self._notify_dropped()
+
+    def clear(self) -> None:
+        """Drops every cached profile and resets the counters."""
+        with self._lock:
+            self._dropped.extend(self._entries)
+            self._entries.clear()
+            self.hits = self.misses = self.evictions = self.expirations = 0
+        self._notify_dropped()
+
+    def add_eviction_listener(self, listener: Callable[[List[str]], None]) -> None:
+        """Calls `listener` with the IDs of profiles dropped by eviction, expiry or `clear`."""
+        self._listeners.append(listener)
+
+    def stats(self) -> Dict[str, Any]:
+        """Returns the hit/miss counters and the current size."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+    def memory_stats(self, sample: int = 200) -> Dict[str, Any]:
+        """
+        Estimates the memory held per cached driver from up to `sample` of the most
+        recently used entries. Kept out of `stats()` because it walks every sampled record.
+        """
+        with self._lock:
+            records = [profile for _, profile in list(self._entries.values())[-sample:]]
+            size = len(self._entries)
+        per_driver = sum(deep_sizeof(record) for record in records) / len(records) if records else 0.0
+        return {"bytes_per_driver": round(per_driver, 1), "approx_total_bytes": int(per_driver * size)}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _get_locked(self, driver_id: str, now: float) -> Optional[DriverRecord]:
+        entry = self._entries.get(driver_id)
+        if entry is None:
+            return None
+        fetched_at, profile = entry
+        if now - fetched_at > self.ttl:
+            del self._entries[driver_id]
+            self.expirations += 1
+            self._dropped.append(driver_id)
+            return None
+        self._entries.move_to_end(driver_id)
+        return profile
+
+    def _store_locked(self, driver_id: str, profile: DriverRecord, fetched_at: float) -> None:
+        self._entries[driver_id] = (fetched_at, profile)
+        self._entries.move_to_end(driver_id)
+        while len(self._entries) > self.max_size:
+            evicted_id, _ = self._entries.popitem(last=False)
+            self.evictions += 1
+            self._dropped.append(evicted_id)
+
+    def _notify_dropped(self) -> None:
+        with self._lock:
+            dropped, self._dropped = self._dropped, []
+        if dropped:
+            for listener in self._listeners:
+                listener(dropped)
+
+    # Hooks for persistent backends, called without the cache lock held.
+    # The in-memory cache has nothing behind it.
+    def _load_many(self, driver_ids: List[str]) -> Dict[str, Tuple[float, DriverRecord]]:
+        return {}
+
+    def _save_many(self, profiles: Dict[str, DriverRecord], fetched_at: float) -> None:
+        pass
+
+
+class SqliteProfileCache(ProfileCache):
+    """
+    A `ProfileCache` whose entries are also written to a SQLite file, so profiles
+    survive restarts and can be shared by several worker processes on one host.
+    The in-memory LRU stays in front of the file for hot drivers. Reads and writes
+    are batched per page of drivers: one SELECT for the misses, one commit per store.
+    """
+
+    blocking_io = True
+    # Parameters per SELECT, below SQLite's default limit on host parameters
+    _BATCH = 500
+
+    def __init__(self, path: str, ttl: float = PROFILE_CACHE_TTL, max_size: int = PROFILE_CACHE_MAX_SIZE):
+        super().__init__(ttl=ttl, max_size=max_size)
+        self.path = path
+        self.disk_hits = 0
+        # Guards the connection, so disk I/O never holds up lookups served from memory
+        self._db_lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS profiles ("
+            "partner_id TEXT PRIMARY KEY, fetched_at REAL NOT NULL, profile TEXT NOT NULL)"
+        )
+        self._conn.execute("DELETE FROM profiles WHERE fetched_at < ?", (time.time() - ttl,))
+        self._conn.commit()
+
+    def clear(self) -> None:
+        super().clear()
+        with self._db_lock:
+            self._conn.execute("DELETE FROM profiles")
+            self._conn.commit()
+            self.disk_hits = 0
+
+    def stats(self) -> Dict[str, Any]:
+        stats = super().stats()
+        stats["disk_hits"] = self.disk_hits
+        return stats
+
+    def _load_many(self, driver_ids: List[str]) -> Dict[str, Tuple[float, DriverRecord]]:
+        cutoff = time.time() - self.ttl
+        rows = []
+        with self._db_lock:
+            for start in range(0, len(driver_ids), self._BATCH):
+                batch = driver_ids[start:start + self._BATCH]
+                rows.extend(self._conn.execute(
+                    f"SELECT partner_id, fetched_at, profile FROM profiles WHERE partner_id IN ({','.join('?' * len(batch))})",
+                    batch,
+                ).fetchall())
+        loaded = {
+            driver_id: (fetched_at, DriverRecord.from_dict(json.loads(profile)))
+            for driver_id, fetched_at, profile in rows if fetched_at >= cutoff
+        }
+        with self._db_lock:
+            self.disk_hits += len(loaded)
+        return loaded
+
+    def _save_many(self, profiles: Dict[str, DriverRecord], fetched_at: float) -> None:
+        if not profiles:
+            return
+        rows = [(driver_id, fetched_at, json.dumps(profile.to_dict())) for driver_id, profile in profiles.items()]
+        with self._db_lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO profiles (partner_id, fetched_at, profile) VALUES (?, ?, ?)", rows
+            )
+            self._conn.commit()
+
+
+def _build_profile_cache() -> ProfileCache:
+    if PROFILE_CACHE_PATH:
+        return SqliteProfileCache(PROFILE_CACHE_PATH)
+    return ProfileCache()
+
+
+# The single cache instance shared by every session in this process.
+profile_cache = _build_profile_cache()
@@ -0,0 +1,175 @@
+import math
+from typing import Dict, Any, Iterable, List, Optional
+
+import numpy as np
+
+from config import (
+    RANK_WEIGHT_EXPERIENCE,
+    RANK_WEIGHT_CONNECTIONS,
+    RANK_WEIGHT_COST,
+    RANK_WEIGHT_VERIFIED_LANGUAGE,
+)
+from schemas.driver_record import DriverRecord
+
+# Columns of the dense feature matrix
+EXPERIENCE, CONNECTIONS, COST = 0, 1, 2
+
+
+def _verified_languages(entries: List[Any]) -> List[str]:
+    """Extracts the lowercased verified languages from a profile's `verifiedLanguages`."""
+    languages = []
+    for entry in entries or []:
+        if isinstance(entry, str):
+            languages.append(entry.lower())
+        elif isinstance(entry, dict) and entry.get('verified', True):
+            language = entry.get('language') or entry.get('name')
+            if isinstance(language, str):
+                languages.append(language.lower())
+    return languages
+
+
+class DriverRanker:
+    """
+    A NumPy feature matrix over the drivers of one city, used to present the best
+    filter matches first. Rows are filled as drivers are indexed, so ranking a
+    candidate set is a few vectorized operations and a partition, with no
+    per-query work on the profiles themselves. Rows of removed drivers are cleared
+    and reused by the next drivers added.
+    Not thread-safe on its own; `DriverIndex` calls it under its lock.
+    """
+
+    def __init__(self, capacity: int = 256):
+        self._rows: Dict[str, int] = {}
+        self._ids: List[Optional[str]] = []
+        self._free: List[int] = []
+        self._features = np.zeros((capacity, 3), dtype=np.float32)
+        # When each row's driver was first added, so ties keep indexing order even in reused rows
+        self._added = np.zeros(capacity, dtype=np.int64)
+        self._next_added = 0
+        # Sparse-by-value columns: one array per verified language and per vehicle type
+        self._verified: Dict[str, np.ndarray] = {}
+        self._type_cost: Dict[str, np.ndarray] = {}
+
+    def add(self, profile: DriverRecord) -> None:
+        """Adds or refreshes the feature row of one driver."""
+        row = self._rows.get(profile.id)
+        if row is None:
+            if self._free:
+                row = self._free.pop()
+                self._ids[row] = profile.id
+            else:
+                row = len(self._ids)
+                if row == len(self._features):
+                    self._grow()
+                self._ids.append(profile.id)
+            self._rows[profile.id] = row
+            self._added[row] = self._next_added
+            self._next_added += 1
+        else:
+            self._clear_row(row)
+
+        costs = [cost for _, _, _, cost, _ in profile.vehicles if cost is not None]
+        self._features[row] = (
+            profile.experience or 0,
+            math.log1p(max(profile.connections or 0, 0)),
+            min(costs) if costs else np.nan,
+        )
+        for language in _verified_languages(profile.heavy_fields()['verifiedLanguages']):
+            self._column(self._verified, language, False)[row] = True
+        for _, _, _, cost, vehicle_type in profile.vehicles:
+            if vehicle_type and cost is not None:
+                column = self._column(self._type_cost, vehicle_type.lower(), np.nan)
+                column[row] = cost if np.isnan(column[row]) else min(column[row], cost)
+
+    def remove(self, driver_id: str) -> None:
+        """Drops the feature row of one driver; the row is reused by a later `add`."""
+        row = self._rows.pop(driver_id, None)
+        if row is None:
+            return
+        self._ids[row] = None
+        self._features[row] = (0, 0, np.nan)
+        self._clear_row(row)
+        self._free.append(row)
+
+    def top_k(self, driver_ids: Iterable[str], filters: Dict[str, Any], k: Optional[int] = None) -> List[str]:
+        """Returns up to `k` of `driver_ids`, best first, scored for the given filters."""
+        if k is not None and k <= 0:
+            return []
+        rows = np.fromiter((self._rows[d] for d in driver_ids if d in self._rows), dtype=np.intp)
+        if not len(rows):
+            return []
+        # In indexing order, so the result does not depend on the iteration order of a set
+        rows = rows[np.argsort(self._added[rows])]
+        scores = self._score(rows, filters)
+        if k is not None and k < len(rows):
+            # Everything above the k-th best score, then the drivers tied with it that were indexed first
+            kth = np.partition(scores, len(scores) - k)[len(scores) - k]
+            above = np.flatnonzero(scores > kth)
+            tied = np.flatnonzero(scores == kth)[:k - len(above)]
+            best = np.concatenate((above, tied))
+            rows, scores = rows[best], scores[best]
+        # Highest score first; ties keep the order in which drivers were indexed
+        order = np.lexsort((self._added[rows], -scores))
+        return [self._ids[row] for row in rows[order]]
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def _score(self, rows: np.ndarray, filters: Dict[str, Any]) -> np.ndarray:
+        # Free rows hold zeros and no price, so they never move the maxima or the price range
+        n = len(self._ids)
+        features = self._features[:n]
+        candidate = self._features[rows]
+
+        experience_max = features[:, EXPERIENCE].max()
+        connections_max = features[:, CONNECTIONS].max()
+        scores = np.zeros(len(rows), dtype=np.float32)
+        if experience_max > 0:
+            scores += RANK_WEIGHT_EXPERIENCE * candidate[:, EXPERIENCE] / experience_max
+        if connections_max > 0:
+            scores += RANK_WEIGHT_CONNECTIONS * candidate[:, CONNECTIONS] / connections_max
+
+        # Price the vehicle the user asked for when a vehicle type filter is set
+        vehicle_type = filters.get('vehicleType')
+        type_cost = self._type_cost.get(vehicle_type.lower()) if isinstance(vehicle_type, str) else None
+        all_costs = type_cost[:n] if type_cost is not None else features[:, COST]
+        costs = all_costs[rows]
+        known = ~np.isnan(all_costs)
+        if known.any():
+            low, high = all_costs[known].min(), all_costs[known].max()
+            cheapness = (high - costs) / (high - low) if high > low else np.ones_like(costs)
+            # Drivers without a known price sit in the middle
+            scores += RANK_WEIGHT_COST * np.where(np.isnan(cheapness), 0.5, cheapness)
+
+        language = filters.get('languages')
+        verified = self._verified.get(language.lower()) if isinstance(language, str) else None
+        if verified is not None:
+            scores += RANK_WEIGHT_VERIFIED_LANGUAGE * verified[rows]
+        return scores
+
+    def _clear_row(self, row: int) -> None:
+        for column in self._verified.values():
+            column[row] = False
+        for column in self._type_cost.values():
+            column[row] = np.nan
+
+    def _column(self, columns: Dict[str, np.ndarray], key: str, fill: Any) -> np.ndarray:
+        column = columns.get(key)
+        if column is None:
+            dtype = bool if isinstance(fill, bool) else np.float32
+            column = columns[key] = np.full(len(self._features), fill, dtype=dtype)
+        return column
+
+    def _grow(self) -> None:
+        capacity = len(self._features) * 2
+        features = np.zeros((capacity, self._features.shape[1]), dtype=np.float32)
+        features[:len(self._features)] = self._features
+        self._features = features
+        added = np.zeros(capacity, dtype=np.int64)
+        added[:len(self._added)] = self._added
+        self._added = added
+        for columns, fill in ((self._verified, False), (self._type_cost, np.nan)):
+            for key, column in columns.items():
+                grown = np.full(capacity, fill, dtype=column.dtype)
+                grown[:len(column)] = column
+                columns[key] = grown
@@ -0,0 +1,160 @@
+import logging
+import threading
+import time
+from collections import deque
+from typing import Dict, Any, Optional
+
+from config import (
+    HTTP_TIMEOUT,
+    LATENCY_WINDOW,
+    LATENCY_MIN_SAMPLES,
+    ADAPTIVE_TIMEOUT_MULTIPLIER,
+    ADAPTIVE_TIMEOUT_MIN,
+    ADAPTIVE_TIMEOUT_BACKOFF,
+    CIRCUIT_FAILURE_THRESHOLD,
+    CIRCUIT_RESET_TIMEOUT,
+)
+from services.telemetry import increment
+
+logger = logging.getLogger(__name__)
+
+
+class LatencyTracker:
+    """
+    Keeps the latencies of an endpoint's most recent requests and derives the
+    per-attempt timeout (a multiple of p99) and the hedge delay (p95) from them.
+    Until enough samples exist, the fixed HTTP_TIMEOUT applies and nothing is hedged.
+    A timed-out attempt is recorded as taking its whole timeout and also backs the
+    timeout off upward, so an endpoint that slows down gets a longer timeout instead
+    of timing out forever against a p99 measured while it was fast.
+    """
+
+    def __init__(self, window: int = LATENCY_WINDOW, min_samples: int = LATENCY_MIN_SAMPLES):
+        self.min_samples = min_samples
+        self._samples: "deque[float]" = deque(maxlen=window)
+        self._backoff = 1.0
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+            self._backoff = max(1.0, self._backoff / ADAPTIVE_TIMEOUT_BACKOFF)
+
+    def record_timeout(self, timeout: float) -> None:
+        with self._lock:
+            self._samples.append(timeout)
+            self._backoff = min(self._backoff * ADAPTIVE_TIMEOUT_BACKOFF, HTTP_TIMEOUT / ADAPTIVE_TIMEOUT_MIN)
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Returns the q-quantile (0..1) of the recent latencies, or None without enough samples."""
+        with self._lock:
+            if len(self._samples) < self.min_samples:
+                return None
+            ordered = sorted(self._samples)
+        return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+    def timeout(self) -> float:
+        p99 = self.quantile(0.99)
+        if p99 is None:
+            return HTTP_TIMEOUT
+        return min(max(p99 * ADAPTIVE_TIMEOUT_MULTIPLIER, ADAPTIVE_TIMEOUT_MIN) * self._backoff, HTTP_TIMEOUT)
+
+    def hedge_delay(self) -> Optional[float]:
+        return self.quantile(0.95)
+
+
+class CircuitBreaker:
+    """
+    Fails fast for an endpoint that keeps failing. After `threshold` consecutive failed
+    requests (each counted once, after its hedges and retries) the circuit opens and requests are rejected without touching the network.
+    Once `reset_timeout` has passed, one probe request is let through (half-open);
+    its success closes the circuit, its failure opens it again.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, endpoint: str, threshold: int = CIRCUIT_FAILURE_THRESHOLD,
+                 reset_timeout: float = CIRCUIT_RESET_TIMEOUT):
+        self.endpoint = endpoint
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.rejected = 0
+        self._opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """Returns True if a request may be sent now."""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            now = time.monotonic()
+            # A probe that never reported back (e.g. it was cancelled) is replaced after the same wait
+            if now - self._opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                self._opened_at = now
+                return True
+            self.rejected += 1
+        increment("backend_circuit_rejections_total", endpoint=self.endpoint)
+        return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self.state != self.CLOSED:
+                logger.debug("Circuit for %s recovered, closing it", self.endpoint)
+            self.state = self.CLOSED
+            self.failures = 0
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or (self.state == self.CLOSED and self.failures >= self.threshold):
+                self.state = self.OPEN
+                self._opened_at = time.monotonic()
+                opened = True
+            else:
+                opened = False
+        if opened:
+            increment("backend_circuit_opened_total", endpoint=self.endpoint)
+            logger.debug("Circuit for %s opened after %s failures", self.endpoint, self.failures)
+
+
+class EndpointPolicy:
+    """The latency tracker and circuit breaker of one backend endpoint."""
+
+    def __init__(self, endpoint: str):
+        self.endpoint = endpoint
+        self.latency = LatencyTracker()
+        self.breaker = CircuitBreaker(endpoint)
+
+    def stats(self) -> Dict[str, Any]:
+        p95 = self.latency.quantile(0.95)
+        p99 = self.latency.quantile(0.99)
+        return {
+            "circuit": self.breaker.state,
+            "consecutive_failures": self.breaker.failures,
+            "rejected": self.breaker.rejected,
+            "p95_ms": round(p95 * 1000, 1) if p95 is not None else None,
+            "p99_ms": round(p99 * 1000, 1) if p99 is not None else None,
+            "timeout_s": round(self.latency.timeout(), 3),
+        }
+
+
+_policies: Dict[str, EndpointPolicy] = {}
+_policies_lock = threading.Lock()
+
+
+def get_policy(endpoint: str) -> EndpointPolicy:
+    """Returns the process-wide policy for an endpoint, creating it on first use."""
+    with _policies_lock:
+        policy = _policies.get(endpoint)
+        if policy is None:
+            policy = _policies[endpoint] = EndpointPolicy(endpoint)
+        return policy
+
+
+def policy_stats() -> Dict[str, Dict[str, Any]]:
+    with _policies_lock:
+        policies = list(_policies.values())
+    return {policy.endpoint: policy.stats() for policy in policies}
@@ -0,0 +1,137 @@
+import asyncio
+import logging
+import time
+import uuid
+from typing import Dict, Optional
+
+from config import SERVER_MAX_SESSIONS, SESSION_IDLE_TIMEOUT
+from schemas.driver_schema import AgentState
+from services.prefetch import discard_prefetcher
+from services.checkpoints import CheckpointStore, checkpoint_store, resume_state
+
+logger = logging.getLogger(__name__)
+
+
+class SessionLimitError(Exception):
+    """Raised when no more conversations fit in this worker."""
+
+
+class Session:
+    """One conversation held by the server."""
+
+    def __init__(self, session_id: str, state: Optional[AgentState] = None):
+        self.session_id = session_id
+        self.state = state if state is not None else AgentState(session_id=session_id)
+        self.last_active = time.monotonic()
+        # Serializes the turns of one conversation
+        self.lock = asyncio.Lock()
+
+    def touch(self) -> None:
+        self.last_active = time.monotonic()
+
+
+class SessionStore:
+    """
+    Keeps the AgentState of every active conversation in memory.
+    Sessions idle for longer than `idle_timeout` seconds are evicted, and no more
+    than `max_sessions` are kept at once. With a checkpoint store, evicted or
+    unknown sessions are resumed from their latest checkpoint on first access.
+    Must be used from a single event loop.
+    """
+
+    def __init__(self, max_sessions: int = SERVER_MAX_SESSIONS, idle_timeout: float = SESSION_IDLE_TIMEOUT,
+                 checkpoints: Optional[CheckpointStore] = checkpoint_store):
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self.checkpoints = checkpoints
+        self._sessions: Dict[str, Session] = {}
+        self._resuming: Dict[str, "asyncio.Future[Optional[Session]]"] = {}
+        self.evictions = 0
+        self.resumed = 0
+
+    async def get(self, session_id: str) -> Optional[Session]:
+        """
+        Returns the session, resuming it from its latest checkpoint if it is not in
+        memory. Checkpoints are read off the event loop, in its default executor, and
+        concurrent requests for the same session share one resume.
+        """
+        session = self._sessions.get(session_id)
+        if session is None and self.checkpoints is not None:
+            resuming = self._resuming.get(session_id)
+            if resuming is None:
+                resuming = self._resuming[session_id] = asyncio.ensure_future(self._resume(session_id))
+                resuming.add_done_callback(lambda _: self._resuming.pop(session_id, None))
+            # A cancelled request must not cancel the resume other requests wait for
+            session = await asyncio.shield(resuming)
+        if session is not None:
+            session.touch()
+        return session
+
+    async def _resume(self, session_id: str) -> Optional[Session]:
+        state = await asyncio.get_running_loop().run_in_executor(None, resume_state, self.checkpoints, session_id)
+        if state is None:
+            return None
+        session = self._sessions.get(session_id)
+        if session is None:
+            session = self.create(session_id, state)
+            self.resumed += 1
+        return session
+
+    def create(self, session_id: Optional[str] = None, state: Optional[AgentState] = None) -> Session:
+        """Creates a new session, evicting idle ones first if the store is full."""
+        if len(self._sessions) >= self.max_sessions:
+            self.evict_idle()
+        if len(self._sessions) >= self.max_sessions:
+            raise SessionLimitError(f"Session limit of {self.max_sessions} reached.")
+        session = Session(session_id or uuid.uuid4().hex, state)
+        self._sessions[session.session_id] = session
+        return session
+
+    async def get_or_create(self, session_id: str) -> Session:
+        session = await self.get(session_id)
+        # Another request may have created it while this one was waiting for the resume
+        return session or self._sessions.get(session_id) or self.create(session_id)
+
+    def checkpoint(self, session: Session) -> None:
+        """Persists the session's state after a turn, if checkpointing is on."""
+        if self.checkpoints is not None:
+            self.checkpoints.save(session.state)
+
+    def remove(self, session_id: str, forget: bool = False) -> bool:
+        """
+        Drops a session from memory. Its checkpoints are kept so it can be resumed,
+        unless `forget` is set.
+        """
+        session = self._sessions.pop(session_id, None)
+        if self.checkpoints is not None:
+            if forget:
+                self.checkpoints.delete(session_id)
+            else:
+                self.checkpoints.release(session_id)
+        if session is None:
+            return False
+        discard_prefetcher(session_id)
+        return True
+
+    def evict_idle(self) -> int:
+        """Evicts every session idle for longer than the timeout, unless a turn is running."""
+        cutoff = time.monotonic() - self.idle_timeout
+        idle = [
+            session_id for session_id, session in self._sessions.items()
+            if session.last_active < cutoff and not session.lock.locked()
+        ]
+        for session_id in idle:
+            self.remove(session_id)
+        self.evictions += len(idle)
+        return len(idle)
+
+    async def run_eviction(self, interval: float = 60) -> None:
+        """Background task that periodically evicts idle sessions."""
+        while True:
+            await asyncio.sleep(interval)
+            evicted = self.evict_idle()
+            if evicted:
+                logger.debug("Evicted %s idle sessions, %s active", evicted, len(self))
+
+    def __len__(self) -> int:
+        return len(self._sessions)
@@ -0,0 +1,40 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+from services.telemetry import increment
+
+
+class SingleFlight:
+    """
+    Collapses concurrent calls that share a key into one in-flight call.
+    The first caller starts the call; callers arriving while it runs await the same
+    task and receive the same result or exception. The shared task is shielded, so a
+    cancelled caller (e.g. an abandoned prefetch) does not cancel it for the others.
+    Must be used from a single event loop (the client loop in `services.api_client`).
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._in_flight: Dict[Hashable, "asyncio.Task"] = {}
+        self.calls = 0
+        self.deduplicated = 0
+
+    async def do(self, key: Hashable, call: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._in_flight.get(key)
+        if task is None:
+            self.calls += 1
+            increment("singleflight_calls_total", kind=self.name)
+            task = asyncio.ensure_future(call())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        else:
+            self.deduplicated += 1
+            increment("singleflight_deduplicated_total", kind=self.name)
+        return await asyncio.shield(task)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "deduplicated": self.deduplicated,
+            "in_flight": len(self._in_flight),
+        }
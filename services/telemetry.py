@@ -0,0 +1,194 @@
+import bisect
+import functools
+import json
+import random
+import threading
+import time
+from typing import Dict, Any, Callable, Iterator, Optional, Sequence, Tuple
+from contextlib import contextmanager
+
+from config import TELEMETRY_SAMPLE_RATE, TELEMETRY_SPAN_FILE
+
+LATENCY_BUCKETS_MS = (1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+SIZE_BUCKETS = (100, 500, 1000, 2000, 4000, 8000, 16000, 32000, 64000, 128000, 512000)
+AGE_BUCKETS_S = (1, 10, 30, 60, 120, 300, 600, 1800, 3600)
+RATIO_BUCKETS = (0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 1.0)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class Histogram:
+    """A fixed-bucket histogram, cheap enough to update on every call."""
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q: float) -> float:
+        """Estimates a quantile as the upper bound of the bucket it falls in."""
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= target:
+                return bound
+        return float("inf")
+
+
+_lock = threading.Lock()
+_histograms: Dict[Tuple[str, Labels], Histogram] = {}
+_counters: Dict[Tuple[str, Labels], float] = {}
+_span_file = None
+
+
+def _key(name: str, labels: Dict[str, Any]) -> Tuple[str, Labels]:
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def observe(name: str, value: float, buckets: Sequence[float] = LATENCY_BUCKETS_MS, **labels: Any) -> None:
+    """Records one value in the histogram `name` with the given labels."""
+    key = _key(name, labels)
+    with _lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = Histogram(buckets)
+        histogram.observe(value)
+
+
+def increment(name: str, amount: float = 1, **labels: Any) -> None:
+    """Adds `amount` to the counter `name` with the given labels."""
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + amount
+
+
+def get_histogram(name: str, **labels: Any) -> Optional[Histogram]:
+    return _histograms.get(_key(name, labels))
+
+
+def get_counter(name: str, **labels: Any) -> float:
+    return _counters.get(_key(name, labels), 0)
+
+
+class Span:
+    """One timed operation. Attributes added with `set` end up in the exported span."""
+
+    __slots__ = ("name", "labels", "attributes", "start", "duration_ms")
+
+    def __init__(self, name: str, labels: Dict[str, Any]):
+        self.name = name
+        self.labels = labels
+        self.attributes: Dict[str, Any] = {}
+        self.start = time.perf_counter()
+        self.duration_ms = 0.0
+
+    def set(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+
+@contextmanager
+def span(name: str, **labels: Any) -> Iterator[Span]:
+    """
+    Times a block. Every span updates the `<name>_ms` latency histogram; a sampled
+    fraction is also written with its attributes to TELEMETRY_SPAN_FILE.
+    Labels should be low-cardinality (node names, endpoints), attributes can be anything.
+    """
+    current = Span(name, labels)
+    error = None
+    try:
+        yield current
+    except BaseException as e:
+        error = type(e).__name__
+        raise
+    finally:
+        current.duration_ms = (time.perf_counter() - current.start) * 1000
+        observe(f"{name}_ms", current.duration_ms, **labels)
+        if error:
+            increment(f"{name}_errors_total", **labels)
+            current.set("error", error)
+        if TELEMETRY_SPAN_FILE and random.random() < TELEMETRY_SAMPLE_RATE:
+            _export(current)
+
+
+def traced(name: str, **labels: Any) -> Callable:
+    """Decorator form of `span` for whole functions such as graph nodes."""
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name, **labels):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def _export(current: Span) -> None:
+    global _span_file
+    record = {
+        "name": current.name,
+        "ts": time.time(),
+        "duration_ms": round(current.duration_ms, 3),
+        **current.labels,
+        **current.attributes,
+    }
+    line = json.dumps(record, default=str) + "\n"
+    with _lock:
+        if _span_file is None:
+            _span_file = open(TELEMETRY_SPAN_FILE, "a", buffering=1)
+        _span_file.write(line)
+
+
+def _format_labels(labels: Labels, extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+    pairs = labels + extra
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in pairs) + "}"
+
+
+def render_prometheus() -> str:
+    """Renders every histogram and counter in the Prometheus text exposition format."""
+    lines = []
+    with _lock:
+        for (name, labels), value in sorted(_counters.items()):
+            lines.append(f"{name}{_format_labels(labels)} {value}")
+        for (name, labels), histogram in sorted(_histograms.items()):
+            cumulative = 0
+            for bound, count in zip(histogram.buckets, histogram.counts):
+                cumulative += count
+                lines.append(f"{name}_bucket{_format_labels(labels, (('le', str(bound)),))} {cumulative}")
+            lines.append(f"{name}_bucket{_format_labels(labels, (('le', '+Inf'),))} {histogram.count}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {histogram.sum}")
+            lines.append(f"{name}_count{_format_labels(labels)} {histogram.count}")
+    return "\n".join(lines) + "\n"
+
+
+def snapshot() -> Dict[str, Any]:
+    """Returns counters and histogram summaries as a plain dict, e.g. for benchmark reports."""
+    with _lock:
+        histograms = {
+            name + _format_labels(labels): {
+                "count": h.count,
+                "mean": round(h.sum / h.count, 3) if h.count else 0,
+                "p50": h.quantile(0.5),
+                "p95": h.quantile(0.95),
+                "p99": h.quantile(0.99),
+            }
+            for (name, labels), h in _histograms.items()
+        }
+        counters = {name + _format_labels(labels): value for (name, labels), value in _counters.items()}
+    return {"counters": counters, "histograms": histograms}
+
+
+def reset() -> None:
+    """Clears all recorded metrics."""
+    with _lock:
+        _histograms.clear()
+        _counters.clear()
@@ -0,0 +1,56 @@
+import logging
+from typing import Any, Dict, List
+
+from pydantic import TypeAdapter, ValidationError
+
+from schemas.driver_schema import PremiumDriver, DetailedDriver, PremiumDriverList, DetailedDriverList
+from services.telemetry import span, increment
+
+logger = logging.getLogger(__name__)
+
+
+def _validate_page(adapter: TypeAdapter, records: List[Any], kind: str) -> List[Any]:
+    """
+    Validates a whole page of records in one pass of a compiled validator.
+    Invalid records are dropped one by one instead of failing the page: the errors
+    name the offending list indices, and the remaining records are validated again.
+    """
+    with span("validation", kind=kind) as validation_span:
+        validation_span.set("records", len(records))
+        try:
+            return adapter.validate_python(records)
+        except ValidationError as e:
+            rejected = {error['loc'][0] for error in e.errors() if error['loc'] and isinstance(error['loc'][0], int)}
+            if not rejected:
+                raise
+            logger.debug("Validation rejected %s of %s %s records: %s", len(rejected), len(records), kind, e)
+            increment("validation_rejected_total", len(rejected), kind=kind)
+            validation_span.set("rejected", len(rejected))
+            return adapter.validate_python([r for i, r in enumerate(records) if i not in rejected])
+
+
+def validate_premium_drivers(drivers_raw: List[Any]) -> List[PremiumDriver]:
+    """Validates a raw listing page into PremiumDriver models, skipping bad records."""
+    return _validate_page(PremiumDriverList, drivers_raw, "premium_page")
+
+
+def combine_driver_data(premium_info: PremiumDriver, details_from_api: Dict[str, Any]) -> Dict[str, Any]:
+    """Merges a validated PremiumDriver with its raw partner data into DetailedDriver input."""
+    return {
+        "existingInfo": premium_info, "age": details_from_api.get("age"),
+        "connections": details_from_api.get("connections", 0), "bio": details_from_api.get("bio"),
+        "experience": details_from_api.get("experience", 0), "isPetAllowed": details_from_api.get("isPetAllowed"),
+        "languages": details_from_api.get("languages", []), "married": details_from_api.get("married"),
+        "phoneNo": details_from_api.get("phoneNo") or premium_info.phoneNo,
+        "routes": details_from_api.get("routes", []), "tripTypes": details_from_api.get("tripTypes", []),
+        "userName": details_from_api.get("userName") or premium_info.userName,
+        "trainingContent": details_from_api.get("trainingContent", []),
+        "vehicleOwnership": details_from_api.get("vehicleOwnership", []),
+        "verifiedLanguages": details_from_api.get("verifiedLanguages", []),
+        "onboardedAt": details_from_api.get("onboardedAt")
+    }
+
+
+def validate_detailed_drivers(combined: List[Dict[str, Any]]) -> List[DetailedDriver]:
+    """Validates a page of combined driver data into DetailedDriver models, skipping bad records."""
+    return _validate_page(DetailedDriverList, combined, "detailed_page")
@@ -0,0 +1,26 @@
+import os
+
+import pytest
+
+from benchmarks.stub_backend import StubBackend
+
+# Every backend call made by the tests goes to a local stub. This runs before any
+# test module imports config, which reads these settings once.
+_backend = StubBackend(latency_ms=1, jitter_ms=0)
+os.environ["CABSWALE_BASE_URL"] = _backend.start()
+os.environ.pop("PROFILE_CACHE_PATH", None)
+os.environ.pop("CHECKPOINT_PATH", None)
+os.environ["WARM_UP_ON_START"] = "false"
+
+
+@pytest.fixture
+def backend() -> StubBackend:
+    return _backend
+
+
+@pytest.fixture(autouse=True)
+def no_speculative_requests(monkeypatch):
+    # Speculative page loads and hedged requests would make the backend call counts nondeterministic
+    from services import api_client, prefetch
+    monkeypatch.setattr(prefetch, "PREFETCH_ENABLED", False)
+    monkeypatch.setattr(api_client, "HEDGE_REQUESTS", False)
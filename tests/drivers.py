@@ -0,0 +1,18 @@
+from typing import List
+
+from benchmarks.stub_backend import StubBackend
+from schemas.driver_record import DriverRecord
+from services.validation import validate_premium_drivers, validate_detailed_drivers, combine_driver_data
+
+
+def make_records(count: int, same_profile: bool = False, city: str = "Pune") -> List[DriverRecord]:
+    """Builds validated driver records from the benchmark stub's generated drivers; with `same_profile`, they differ only by ID."""
+    stub = StubBackend()
+    premium = []
+    for i in range(count):
+        driver = stub.premium_driver(city, 1 if same_profile else i)
+        driver["id"] = f"{city.lower()}-{i:05d}"
+        premium.append(driver)
+    premium = validate_premium_drivers(premium)
+    detailed = [combine_driver_data(p, stub.partner_data("x-00001" if same_profile else p.id)) for p in premium]
+    return [DriverRecord.from_model(driver) for driver in validate_detailed_drivers(detailed)]
@@ -0,0 +1,95 @@
+import time
+
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+from graph import nodes
+from schemas.driver_schema import AgentState
+from services.checkpoints import CheckpointStore, resume_state, SNAPSHOT, DELTA
+from services.profile_cache import profile_cache
+
+
+def _kinds(store: CheckpointStore, session_id: str):
+    rows = store._conn.execute("SELECT kind FROM checkpoints WHERE session_id = ? ORDER BY seq", (session_id,))
+    return [kind for kind, in rows]
+
+
+def _turn(state: AgentState, text: str) -> None:
+    state.messages.append(HumanMessage(content=text))
+    state.messages.append(AIMessage(content="", tool_calls=[{"name": "find_drivers", "args": {"city": state.city}, "id": text}]))
+    state.messages.append(ToolMessage(content='{"city": "%s"}' % state.city, tool_call_id=text, name="find_drivers"))
+    nodes._fetch_next_page(state)
+    state.presented_driver_ids.update(state.driver_ids[-3:])
+    state.messages.append(AIMessage(content=f"Reply to {text}"))
+
+
+def _assert_same(resumed: AgentState, state: AgentState) -> None:
+    assert resumed.model_dump() == state.model_dump()
+    assert resumed.messages == state.messages
+
+
+def test_deltas_round_trip(tmp_path):
+    path = str(tmp_path / "checkpoints.db")
+    store = CheckpointStore(path)
+    state = AgentState(session_id="s1", city="Surat")
+    for turn in range(4):
+        _turn(state, f"turn {turn}")
+        state.filters = {"languages": "hindi"} if turn % 2 else {}
+        store.save(state)
+    assert _kinds(store, "s1") == [SNAPSHOT, DELTA, DELTA, DELTA]
+
+    # A fresh store, as after a restart, rebuilds the state from the snapshot and deltas
+    _assert_same(CheckpointStore(path).load("s1"), state)
+
+
+def test_resumed_sessions_keep_writing_deltas(tmp_path):
+    path = str(tmp_path / "checkpoints.db")
+    state = AgentState(session_id="s1", city="Surat")
+    _turn(state, "first")
+    CheckpointStore(path).save(state)
+
+    store = CheckpointStore(path)
+    resumed = store.load("s1")
+    _turn(resumed, "second")
+    store.save(resumed)
+    assert _kinds(store, "s1") == [SNAPSHOT, DELTA]
+    _assert_same(CheckpointStore(path).load("s1"), resumed)
+
+
+def test_city_change_and_compaction_write_snapshots(tmp_path):
+    store = CheckpointStore(str(tmp_path / "checkpoints.db"), compact_every=2)
+    state = AgentState(session_id="s1", city="Surat")
+    _turn(state, "first")
+    store.save(state)
+
+    state.city, state.page, state.driver_ids, state.driver_listings = "Agra", 1, [], {}
+    state.presented_driver_ids = set()
+    _turn(state, "second")
+    store.save(state)
+    assert _kinds(store, "s1") == [SNAPSHOT]
+
+    for turn in range(3):
+        _turn(state, f"turn {turn}")
+        store.save(state)
+    assert _kinds(store, "s1") == [SNAPSHOT]
+    _assert_same(store.load("s1"), state)
+
+
+def test_resume_fetches_profiles_missing_from_the_cache(tmp_path, backend):
+    path = str(tmp_path / "checkpoints.db")
+    state = AgentState(session_id="s1", city="Jaipur")
+    _turn(state, "first")
+    CheckpointStore(path).save(state)
+
+    # As after a restart without PROFILE_CACHE_PATH
+    profile_cache.clear()
+    calls = backend.calls["details"]
+    resumed = resume_state(CheckpointStore(path), "s1")
+    deadline = time.monotonic() + 5
+    while len(profile_cache.get_many(resumed.driver_ids)) < len(resumed.driver_ids) and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert backend.calls["details"] - calls == len(resumed.driver_ids)
+
+    calls = backend.calls["details"]
+    matches = nodes._find_unseen_matches(resumed, {}, 20)
+    assert {driver["existingInfo"]["id"] for driver in matches} == set(resumed.driver_ids) - resumed.presented_driver_ids
+    assert backend.calls["details"] == calls
@@ -0,0 +1,53 @@
+from services.driver_index import DriverIndex
+from services.profile_cache import ProfileCache
+from tests.drivers import make_records
+
+
+def test_index_follows_profile_cache_evictions():
+    cache = ProfileCache(max_size=10)
+    index = DriverIndex()
+    cache.add_eviction_listener(index.remove)
+    records = make_records(30)
+    for start in range(0, 30, 10):
+        page = {record.id: record for record in records[start:start + 10]}
+        cache.put_many(page)
+        index.add_many(page.values())
+    assert len(index) == 10
+    assert len(index._ranker) == 10
+    assert set(index.query({})) == {record.id for record in records[20:]}
+    # Rows freed by evicted drivers were reused instead of growing the matrix
+    assert len(index._ranker._ids) == 10
+
+
+def test_index_follows_profile_cache_expiry():
+    cache = ProfileCache(ttl=-1)
+    index = DriverIndex()
+    cache.add_eviction_listener(index.remove)
+    records = make_records(5)
+    cache.put_many({record.id: record for record in records})
+    index.add_many(records)
+    assert cache.get_many(record.id for record in records[:2]) == {}
+    assert index.query({}) == [record.id for record in records[2:]]
+
+
+def test_removed_drivers_leave_every_posting():
+    index = DriverIndex()
+    records = make_records(20)
+    index.add_many(records)
+    removed = {record.id for record in records[::2]}
+    assert index.remove(removed) == 10
+    assert index.remove(removed) == 0
+    for filters in ({"languages": "hindi"}, {"vehicleType": "suv"}, {"isPetAllowed": True}):
+        assert not removed & set(index.query(filters))
+        assert not removed & set(index.query(filters, ranked=True))
+
+
+def test_ranked_ties_keep_indexing_order_in_reused_rows():
+    index = DriverIndex()
+    records = make_records(12, same_profile=True)
+    index.add_many(records[:8])
+    index.remove([records[1].id, records[2].id])
+    index.add_many(records[8:])
+    expected = [record.id for record in records[:1] + records[3:]]
+    assert index.query({}, ranked=True) == expected
+    assert index.query({}, ranked=True, limit=4) == expected[:4]
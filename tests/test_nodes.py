@@ -0,0 +1,78 @@
+import json
+
+from langchain_core.messages import AIMessage
+
+from graph import nodes
+from services import api_client, resilience
+from schemas.driver_schema import AgentState
+from services.driver_index import get_city_index
+from services.profile_cache import profile_cache
+
+
+def _state_with_a_page(city: str) -> AgentState:
+    state = AgentState(city=city)
+    nodes._fetch_next_page(state)
+    assert state.driver_ids
+    assert list(state.driver_listings) == state.driver_ids
+    return state
+
+
+def test_filters_fetch_profiles_that_left_the_cache_again(backend):
+    state = _state_with_a_page("Nashik")
+    profile_cache.clear()
+    assert not any(driver_id in get_city_index("Nashik") for driver_id in state.driver_ids)
+
+    calls = backend.calls["details"]
+    matches = nodes._find_unseen_matches(state, {}, 5)
+    assert len(matches) == 5
+    assert backend.calls["details"] > calls
+    assert all(driver_id in get_city_index("Nashik") for driver_id in state.driver_ids)
+
+
+def test_contact_lookup_fetches_an_evicted_profile_again(backend):
+    state = _state_with_a_page("Nagpur")
+    driver_id = state.driver_ids[0]
+    profile_cache.clear()
+
+    message = nodes._execute_tool_call(
+        state, {"name": "get_driver_contact_info", "args": {"driver_id": driver_id}, "id": "call-1"}
+    )
+    assert json.loads(message.content) == {"contact_info": state.driver_listings[driver_id].phoneNo}
+
+
+def test_contact_lookup_of_an_unknown_driver_fails():
+    state = _state_with_a_page("Nagpur")
+    message = nodes._execute_tool_call(
+        state, {"name": "get_driver_contact_info", "args": {"driver_id": "nobody"}, "id": "call-1"}
+    )
+    assert "error" in json.loads(message.content)
+
+
+def test_backend_failure_is_not_the_end_of_the_list(backend, monkeypatch):
+    monkeypatch.setattr(api_client, "RETRY_BASE_DELAY", 0)
+    monkeypatch.setattr(resilience, "_policies", {})
+    state = AgentState(city="Kota")
+    monkeypatch.setattr(backend, "error_rate", 1.0)
+    assert nodes._fetch_next_page(state) is None
+    assert state.page == 1
+    assert not state.no_more_drivers
+
+    monkeypatch.setattr(backend, "error_rate", 0.0)
+    assert nodes._fetch_next_page(state) == len(state.driver_ids) > 0
+    assert state.page == 2
+
+
+def test_filter_calls_in_one_response_present_different_drivers(backend):
+    state = _state_with_a_page("Indore")
+    state.messages.append(AIMessage(content="", tool_calls=[
+        {"name": "filter_drivers", "args": {"pets_allowed": True}, "id": "call-1"},
+        {"name": "filter_drivers", "args": {}, "id": "call-2"},
+        {"name": "get_driver_contact_info", "args": {"driver_id": state.driver_ids[0]}, "id": "call-3"},
+    ]))
+    nodes.tool_node({"agent_state": state})
+    first, second, contact = state.messages[-3:]
+    assert [first.tool_call_id, second.tool_call_id, contact.tool_call_id] == ["call-1", "call-2", "call-3"]
+    first_ids = {driver["existingInfo"]["id"] for driver in json.loads(first.content)["matched_drivers"]}
+    second_ids = {driver["existingInfo"]["id"] for driver in json.loads(second.content)["matched_drivers"]}
+    assert first_ids and second_ids
+    assert not first_ids & second_ids
@@ -0,0 +1,14 @@
+from collections import OrderedDict
+
+from services import prefetch
+
+
+def test_prefetchers_are_bounded(monkeypatch):
+    monkeypatch.setattr(prefetch, "_prefetchers", OrderedDict())
+    monkeypatch.setattr(prefetch, "PREFETCH_MAX_SESSIONS", 2)
+    first = prefetch.get_prefetcher("a")
+    prefetch.get_prefetcher("b")
+    # Using "a" again makes "b" the least recently used
+    assert prefetch.get_prefetcher("a") is first
+    prefetch.get_prefetcher("c")
+    assert list(prefetch._prefetchers) == ["a", "c"]
@@ -0,0 +1,55 @@
+import threading
+import time
+
+from services.profile_cache import ProfileCache, SqliteProfileCache
+from tests.drivers import make_records
+
+
+def test_get_many_keeps_order_and_skips_misses():
+    cache = ProfileCache()
+    records = make_records(5)
+    cache.put_many({record.id: record for record in records[:3]})
+    ids = [records[4].id, records[2].id, records[0].id, records[3].id]
+    assert list(cache.get_many(ids)) == [records[2].id, records[0].id]
+    assert cache.stats()["hits"] == 2
+    assert cache.stats()["misses"] == 2
+
+
+def test_sqlite_cache_survives_restarts(tmp_path):
+    path = str(tmp_path / "profiles.db")
+    records = make_records(20)
+    SqliteProfileCache(path).put_many({record.id: record for record in records})
+
+    reopened = SqliteProfileCache(path)
+    loaded = reopened.get_many(record.id for record in records)
+    assert list(loaded) == [record.id for record in records]
+    assert loaded[records[3].id].to_dict() == records[3].to_dict()
+    assert reopened.stats()["disk_hits"] == 20
+    # Now served from memory
+    reopened.get_many(record.id for record in records)
+    assert reopened.stats()["disk_hits"] == 20
+
+
+def test_sqlite_cache_ignores_expired_rows(tmp_path):
+    path = str(tmp_path / "profiles.db")
+    record = make_records(1)[0]
+    SqliteProfileCache(path).put(record.id, record)
+    assert SqliteProfileCache(path, ttl=-1).get(record.id) is None
+
+
+def test_memory_hits_do_not_wait_for_disk_reads(tmp_path):
+    path = str(tmp_path / "profiles.db")
+    records = make_records(2)
+    SqliteProfileCache(path).put(records[1].id, records[1])
+    cache = SqliteProfileCache(path)
+    cache.put(records[0].id, records[0])
+
+    # Hold the connection, as a slow disk read would, and look up the disk-only profile
+    with cache._db_lock:
+        reader = threading.Thread(target=cache.get, args=(records[1].id,))
+        reader.start()
+        time.sleep(0.05)
+        assert cache.get(records[0].id) is not None
+    reader.join(timeout=5)
+    assert cache.get(records[1].id).to_dict() == records[1].to_dict()
+    assert cache.stats()["disk_hits"] == 1
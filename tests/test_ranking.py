@@ -0,0 +1,36 @@
+import random
+
+from services.driver_index import DriverIndex
+from tests.drivers import make_records
+
+
+def test_ties_keep_indexing_order():
+    records = make_records(50, same_profile=True)
+    index = DriverIndex()
+    index.add_many(records)
+    ids = [record.id for record in records]
+    expected = ids[:5]
+    for seed in range(20):
+        within = list(ids)
+        random.Random(seed).shuffle(within)
+        assert index.query({}, within=set(within), limit=5, ranked=True) == expected
+        assert index._ranker.top_k(within, {}, 5) == expected
+
+
+def test_top_k_matches_a_full_sort():
+    records = make_records(200)
+    index = DriverIndex()
+    index.add_many(records)
+    filters = {"languages": "english"}
+    full = index.query(filters, ranked=True)
+    for k in (1, 3, 10, len(full)):
+        assert index.query(filters, limit=k, ranked=True) == full[:k]
+
+
+def test_top_k_with_no_room_is_empty():
+    records = make_records(10)
+    index = DriverIndex()
+    index.add_many(records)
+    ids = [record.id for record in records]
+    for k in (0, -3):
+        assert index._ranker.top_k(ids, {}, k) == []
@@ -0,0 +1,183 @@
+import pytest
+
+from benchmarks.stub_backend import StubBackend
+from config import HTTP_TIMEOUT, ADAPTIVE_TIMEOUT_MIN, RETRY_ATTEMPTS, CIRCUIT_FAILURE_THRESHOLD
+from services import api_client, resilience
+from services.resilience import LatencyTracker, CircuitBreaker
+
+
+def test_timeout_falls_back_to_http_timeout_without_samples():
+    tracker = LatencyTracker(min_samples=5)
+    tracker.record(0.05)
+    assert tracker.timeout() == HTTP_TIMEOUT
+    assert tracker.hedge_delay() is None
+
+
+def test_timeout_follows_p99_within_bounds():
+    tracker = LatencyTracker(min_samples=5)
+    for _ in range(50):
+        tracker.record(0.05)
+    assert tracker.timeout() == ADAPTIVE_TIMEOUT_MIN
+    for _ in range(50):
+        tracker.record(2.0)
+    assert tracker.timeout() == 4.0
+    for _ in range(50):
+        tracker.record(60.0)
+    assert tracker.timeout() == HTTP_TIMEOUT
+
+
+def test_timeouts_back_the_timeout_off_upward():
+    tracker = LatencyTracker(min_samples=5)
+    for _ in range(50):
+        tracker.record(0.05)
+    first = tracker.timeout()
+    tracker.record_timeout(first)
+    second = tracker.timeout()
+    assert second > first
+    tracker.record_timeout(second)
+    assert tracker.timeout() > second
+    for _ in range(20):
+        tracker.record_timeout(tracker.timeout())
+    assert tracker.timeout() == HTTP_TIMEOUT
+
+
+def test_slowed_down_endpoint_recovers():
+    # The endpoint used to answer in 50ms and now takes 1.3s, above the 1s timeout
+    tracker = LatencyTracker(min_samples=5)
+    for _ in range(50):
+        tracker.record(0.05)
+    outcomes = []
+    for _ in range(20):
+        timeout = tracker.timeout()
+        if 1.3 > timeout:
+            tracker.record_timeout(timeout)
+            outcomes.append("timeout")
+        else:
+            tracker.record(1.3)
+            outcomes.append("ok")
+    assert outcomes[0] == "timeout"
+    assert outcomes[-10:] == ["ok"] * 10
+
+
+def test_successes_undo_the_backoff():
+    tracker = LatencyTracker(window=20, min_samples=5)
+    for _ in range(20):
+        tracker.record(0.05)
+    for _ in range(3):
+        tracker.record_timeout(tracker.timeout())
+    assert tracker.timeout() > ADAPTIVE_TIMEOUT_MIN
+    for _ in range(20):
+        tracker.record(0.05)
+    assert tracker.timeout() == ADAPTIVE_TIMEOUT_MIN
+
+
+def test_breaker_opens_after_threshold_failures():
+    breaker = CircuitBreaker("test", threshold=3, reset_timeout=10)
+    for _ in range(2):
+        breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow()
+    assert breaker.rejected == 1
+
+
+def test_breaker_success_resets_the_failure_count():
+    breaker = CircuitBreaker("test", threshold=3, reset_timeout=10)
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_breaker_half_open_probe(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(resilience.time, "monotonic", lambda: now[0])
+    breaker = CircuitBreaker("test", threshold=1, reset_timeout=10)
+    breaker.record_failure()
+    assert not breaker.allow()
+
+    now[0] += 10
+    assert breaker.allow()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    # Only one probe goes through
+    assert not breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+
+    now[0] += 10
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.allow()
+
+
+def test_breaker_replaces_a_probe_that_never_reported(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(resilience.time, "monotonic", lambda: now[0])
+    breaker = CircuitBreaker("test", threshold=1, reset_timeout=10)
+    breaker.record_failure()
+    now[0] += 10
+    assert breaker.allow()
+    now[0] += 5
+    assert not breaker.allow()
+    now[0] += 5
+    assert breaker.allow()
+
+
+@pytest.fixture
+def failing_backend(monkeypatch):
+    monkeypatch.setattr(api_client, "RETRY_BASE_DELAY", 0)
+    monkeypatch.setattr(resilience, "_policies", {})
+    stub = StubBackend(latency_ms=1, jitter_ms=0, error_rate=1.0)
+    base_url = stub.start()
+    return stub, f"{base_url}/typesense-getPartnersByLocation"
+
+
+def _request(url: str):
+    return api_client.run_sync(api_client.async_make_api_request(url, {"city": "Pune"}, idempotent=True))
+
+
+def test_breaker_counts_one_failure_per_request(failing_backend):
+    stub, url = failing_backend
+    result = _request(url)
+    assert "error" in result
+    # Every attempt reached the backend, but the request failed only once
+    assert stub.calls["errors"] == 1 + RETRY_ATTEMPTS
+    breaker = resilience.get_policy("typesense-getPartnersByLocation").breaker
+    assert breaker.failures == 1
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_breaker_probe_is_not_retried(failing_backend, monkeypatch):
+    stub, url = failing_backend
+    breaker = resilience.get_policy("typesense-getPartnersByLocation").breaker
+    for _ in range(CIRCUIT_FAILURE_THRESHOLD):
+        _request(url)
+    assert breaker.state == CircuitBreaker.OPEN
+    calls = stub.calls["errors"]
+    assert "Circuit open" in _request(url)["error"]
+    assert stub.calls["errors"] == calls
+
+    monkeypatch.setattr(breaker, "_opened_at", breaker._opened_at - breaker.reset_timeout)
+    assert "error" in _request(url)
+    assert stub.calls["errors"] == calls + 1
+    assert breaker.state == CircuitBreaker.OPEN
+
+
+def test_breaker_probe_answered_with_a_client_error_closes_the_circuit(failing_backend, monkeypatch):
+    stub, url = failing_backend
+    # The stub does not serve this endpoint, so every request gets a 404
+    url = url.rsplit("/", 1)[0] + "/missing-endpoint"
+    breaker = resilience.get_policy("missing-endpoint").breaker
+    for _ in range(CIRCUIT_FAILURE_THRESHOLD):
+        breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+
+    monkeypatch.setattr(breaker, "_opened_at", breaker._opened_at - breaker.reset_timeout)
+    assert "error" in _request(url)
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.failures == 0
@@ -0,0 +1,70 @@
+import asyncio
+import json
+from typing import Any, List, Optional
+
+from aiohttp.test_utils import TestClient, TestServer
+from langchain_core.messages import BaseMessage, ToolMessage
+
+import server
+from benchmarks.fake_llm import ScriptedChatModel
+from graph import nodes
+
+
+class FailingAfterFilterModel(ScriptedChatModel):
+    """Fails on the model call that follows a `filter_drivers` result, i.e. mid-turn."""
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, **kwargs: Any):
+        last = self._conversation(messages)[-1]
+        if isinstance(last, ToolMessage) and last.name == "filter_drivers":
+            raise ConnectionError("model unavailable")
+        return super()._generate(messages, stop, **kwargs)
+
+
+def _run(scenario):
+    async def main():
+        async with TestClient(TestServer(server.create_app())) as client:
+            return await scenario(client)
+    return asyncio.run(main())
+
+
+def test_failed_turn_restores_the_whole_state():
+    nodes.set_chat_model(FailingAfterFilterModel())
+
+    async def scenario(client):
+        session_id = (await (await client.post("/sessions")).json())["session_id"]
+        response = await client.post(f"/sessions/{session_id}/messages", json={"message": "city Udaipur"})
+        assert response.status == 200
+        session = await client.server.app["sessions"].get(session_id)
+        before = session.state.model_dump()
+
+        response = await client.post(f"/sessions/{session_id}/messages", json={"message": "filter language=english"})
+        assert response.status == 503
+        assert session.state.model_dump() == before
+        assert session.state.presented_driver_ids == set()
+        assert session.state.filters == {}
+
+        # The socket reports the failure and stays usable
+        ws = await client.ws_connect(f"/ws/{session_id}")
+        await ws.send_str("filter language=english")
+        assert (await ws.receive_json())["retry"] is True
+        await ws.send_str("hello")
+        while True:
+            frame = await ws.receive_json()
+            if frame.get("type") != "token":
+                break
+        assert frame["reply"]
+        await ws.close()
+
+    _run(scenario)
+
+
+def test_malformed_bodies_are_rejected():
+    nodes.set_chat_model(ScriptedChatModel())
+
+    async def scenario(client):
+        session_id = (await (await client.post("/sessions")).json())["session_id"]
+        for body in ("not json", json.dumps([1, 2]), json.dumps({"message": ""})):
+            response = await client.post(f"/sessions/{session_id}/messages", data=body)
+            assert response.status == 400
+
+    _run(scenario)
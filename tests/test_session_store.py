@@ -0,0 +1,33 @@
+import asyncio
+
+from langchain_core.messages import HumanMessage
+
+from schemas.driver_schema import AgentState
+from services import session_store
+from services.checkpoints import CheckpointStore, resume_state
+from services.session_store import SessionStore
+
+
+def test_concurrent_requests_share_one_resume(tmp_path, monkeypatch):
+    checkpoints = CheckpointStore(str(tmp_path / "checkpoints.db"))
+    checkpoints.save(AgentState(session_id="s1", messages=[HumanMessage(content="city Pune")]))
+    resumes = []
+
+    def counting_resume(store, session_id):
+        resumes.append(session_id)
+        return resume_state(store, session_id)
+
+    monkeypatch.setattr(session_store, "resume_state", counting_resume)
+
+    async def main():
+        store = SessionStore(checkpoints=checkpoints)
+        sessions = await asyncio.gather(*(store.get("s1") for _ in range(5)))
+        created = await asyncio.gather(*(store.get_or_create("new") for _ in range(5)))
+        return store, sessions, created
+
+    store, sessions, created = asyncio.run(main())
+    assert resumes == ["s1", "new"]
+    assert all(session is sessions[0] for session in sessions)
+    assert sessions[0].state.messages[0].content == "city Pune"
+    assert all(session is created[0] for session in created)
+    assert store.resumed == 1 and len(store) == 2
@@ -1,13 +1,16 @@
+import logging
 from typing import Dict, Optional, Any
 from langchain_core.tools import tool
 
+logger = logging.getLogger(__name__)
+
 @tool
 def set_city(city: str) -> Dict[str, str]:
     """
     Use this tool to set or update the user's city when they specify one.
     This should be your first step if the city is not already set or if the user names a new city.
     """
-    print(f"--- TOOL: Setting city to {city} ---")
+    logger.debug("Setting city to %s", city)
     return {"city_updated": city}
 
 @tool
@@ -16,17 +19,25 @@ def find_drivers(city: str) -> Dict[str, Any]:
     Finds the NEXT page of available drivers for a given city to add to the local cache.
     Use this when the user asks to see more drivers, or when a filter comes up empty.
     """
-    print(f"--- TOOL: Finding more drivers in {city} ---")
+    logger.debug("Finding more drivers in %s", city)
     return {"city": city}
 
 # --- NEW FILTERING TOOL ---
 @tool
-def filter_drivers(language: Optional[str] = None, pets_allowed: Optional[bool] = None, married: Optional[bool] = None) -> Dict[str, Any]:
+def filter_drivers(
+    language: Optional[str] = None,
+    pets_allowed: Optional[bool] = None,
+    married: Optional[bool] = None,
+    vehicle_type: Optional[str] = None,
+    trip_type: Optional[str] = None,
+) -> Dict[str, Any]:
     """
-    Filters the currently cached list of drivers based on user preferences like language, pet policy, or marital status.
+    Filters the currently cached list of drivers based on user preferences like language, pet policy,
+    marital status, vehicle type (e.g. "sedan", "suv") or trip type (e.g. "outstation").
     Call this tool whenever a user expresses a preference.
     """
-    print(f"--- TOOL: Applying filters: lang='{language}', pets='{pets_allowed}', married='{married}' ---")
+    logger.debug("Applying filters: lang=%r, pets=%r, married=%r, vehicle=%r, trip=%r",
+                 language, pets_allowed, married, vehicle_type, trip_type)
     
     # The tool itself just returns the filters. The tool_node will perform the actual filtering logic.
     active_filters = {}
@@ -36,6 +47,10 @@ def filter_drivers(language: Optional[str] = None, pets_allowed: Optional[bool]
         active_filters['isPetAllowed'] = pets_allowed
     if married is not None:
         active_filters['married'] = married
+    if vehicle_type is not None:
+        active_filters['vehicleType'] = vehicle_type.lower()
+    if trip_type is not None:
+        active_filters['tripTypes'] = trip_type.lower()
         
     return {"filters_to_apply": active_filters}
 
@@ -46,7 +61,7 @@ def get_driver_contact_info(driver_id: str) -> Dict[str, str]:
     """
     Use this as the final step to get the contact number for a specific driver when the user confirms they want to book.
     """
-    print(f"--- TOOL: Getting contact info for driver_id: {driver_id} ---")
+    logger.debug("Getting contact info for driver_id: %s", driver_id)
     return {"driver_id_for_contact": driver_id}
 
 